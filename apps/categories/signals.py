@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.cache import invalidate
+from .models import Category
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_listings(sender, **kwargs):
+    invalidate('category-recipes')
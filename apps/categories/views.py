@@ -1,6 +1,9 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from apps.core.cache import cached_listing
+from apps.ingredients.tags import to_flags
+from apps.recipes.filters import excluded_flags
 from .models import Category
 from .serializers import CategorySerializer
 
@@ -12,12 +15,22 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]  # Categories are public
+    throttle_costs = {'recipes': 3, 'default': 1}
     
     @action(detail=True, methods=['get'])
     def recipes(self, request, pk=None):
-        """Get all recipes in this category"""
+        """Get all recipes in this category, leaving out ones unsafe for the user"""
+        response = self.recipes_cached(request, pk=pk)
+        excluded = excluded_flags(request)
+        if response.status_code == 200 and excluded:
+            # The cached listing is shared by all users, so filter it per request
+            response.data = [recipe for recipe in response.data if not to_flags(recipe['tags']) & excluded]
+        return response
+    
+    @cached_listing('category-recipes')
+    def recipes_cached(self, request, pk=None):
         category = self.get_object()
-        recipes = category.recipes.all()
+        recipes = category.recipes.for_listing().prefetch_related('recipe_ingredients')
         from apps.recipes.serializers import RecipeListSerializer
         serializer = RecipeListSerializer(recipes, many=True)
         return Response(serializer.data)
\ No newline at end of file
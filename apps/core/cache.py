@@ -0,0 +1,207 @@
+"""
+Single-flight caching for expensive listings.
+
+When a hot cache entry expires, only one request recomputes it. Concurrent
+requests in the same process wait for that result, requests in other
+processes wait on a lock held in the cache, and while a stale value is still
+available everyone else is served the stale value (stale-while-revalidate).
+Entries may also be refreshed slightly before they expire, with a probability
+that rises as expiry approaches (probabilistic early expiration), so that
+recomputation is spread out instead of happening at the same instant.
+
+Settings (all optional)::
+
+    LISTING_CACHE = {
+        'TTL': 60,          # seconds a value is fresh
+        'STALE_TTL': 300,   # seconds a value may be served stale after that
+        'BETA': 1.0,        # early expiration eagerness, 0 disables it
+    }
+"""
+import functools
+import hashlib
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import metrics
+
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = _MISSING
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _config(name, default):
+    return getattr(settings, 'LISTING_CACHE', {}).get(name, default)
+
+
+def _should_refresh(entry, now, beta):
+    # Refresh early with a probability that grows as expiry nears, scaled by
+    # how long the value took to compute last time.
+    return now - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['expires']
+
+
+def _compute_and_store(key, compute, ttl, stale_ttl):
+    started = time.time()
+    value = compute()
+    now = time.time()
+    entry = {'value': value, 'expires': now + ttl, 'delta': now - started}
+    cache.set(key, entry, ttl + stale_ttl)
+    return value
+
+
+def _wait_for_value(key, deadline):
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry['expires'] > time.time():
+            return entry['value']
+    return _MISSING
+
+
+def get_or_compute(key, compute, ttl=None, stale_ttl=None, beta=None):
+    """
+    Return the cached value for ``key``, calling ``compute`` to fill it.
+
+    At most one caller per key recomputes at a time; the others are coalesced
+    onto its result or served the previous value while it is still within
+    ``stale_ttl``. Across processes this relies on ``cache.add`` being
+    atomic, which it is not for FileBasedCache: there two processes may
+    occasionally both recompute an entry.
+    """
+    ttl = _config('TTL', 60) if ttl is None else ttl
+    stale_ttl = _config('STALE_TTL', 300) if stale_ttl is None else stale_ttl
+    beta = _config('BETA', 1.0) if beta is None else beta
+    lock_key = f"{key}:lock"
+
+    now = time.time()
+    entry = cache.get(key)
+    if entry is not None:
+        if not _should_refresh(entry, now, beta):
+            metrics.incr('cache.hit')
+            return entry['value']
+        if now < entry['expires'] + stale_ttl:
+            if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                # Someone else is already refreshing this entry
+                metrics.incr('cache.stale')
+                metrics.incr('cache.coalesced')
+                return entry['value']
+            try:
+                metrics.incr('cache.refresh')
+                return _compute_and_store(key, compute, ttl, stale_ttl)
+            finally:
+                cache.delete(lock_key)
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        metrics.incr('cache.coalesced')
+        flight.event.wait(WAIT_TIMEOUT)
+        if flight.value is not _MISSING:
+            return flight.value
+        # The leader failed or is taking too long, compute independently
+        metrics.incr('cache.miss')
+        return compute()
+
+    try:
+        metrics.incr('cache.miss')
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # Another process is computing it, wait for its result
+            flight.value = _wait_for_value(key, time.time() + WAIT_TIMEOUT)
+            if flight.value is not _MISSING:
+                metrics.incr('cache.coalesced')
+                return flight.value
+            flight.value = compute()
+            return flight.value
+        try:
+            flight.value = _compute_and_store(key, compute, ttl, stale_ttl)
+        finally:
+            cache.delete(lock_key)
+        return flight.value
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.event.set()
+
+
+def _version_key(namespace):
+    return f"listing-version:{namespace}"
+
+
+def namespace_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(namespace), version, None):
+            version = cache.get(_version_key(namespace), version)
+    return version
+
+
+def namespace_versions(namespaces):
+    """Current versions of several namespaces with one cache lookup"""
+    found = cache.get_many([_version_key(namespace) for namespace in namespaces])
+    return [
+        found.get(_version_key(namespace)) or namespace_version(namespace)
+        for namespace in namespaces
+    ]
+
+
+def invalidate(namespace):
+    """Make every cached listing in ``namespace`` stale once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(_version_key(namespace), time.time_ns(), None))
+
+
+def listing_key(namespace, request):
+    # The host is part of the pagination links
+    path = hashlib.md5(f"{request.get_host()}{request.get_full_path()}".encode()).hexdigest()
+    return f"listing:{namespace}:{namespace_version(namespace)}:{path}"
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def cached_listing(namespace, ttl=None, stale_ttl=None, beta=None):
+    """
+    Cache the response data of a viewset list method with single-flight
+    protection. Only 200 responses are cached; the cache key includes the
+    full request path, so query parameters and pages are cached separately.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            def compute():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    raise _Uncacheable(response)
+                return response.data
+
+            try:
+                data = get_or_compute(listing_key(namespace, request), compute, ttl, stale_ttl, beta)
+            except _Uncacheable as exc:
+                return exc.response
+            return Response(data)
+        return wrapper
+    return decorator
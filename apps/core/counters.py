@@ -0,0 +1,255 @@
+"""
+Write-behind view counters.
+
+Incrementing a counter column on every read would turn each read into a
+write and serialize requests on the database write lock. Instead increments
+are aggregated in memory per worker process and flushed as a few batched
+UPDATE statements by a background thread every FLUSH_INTERVAL seconds, or
+early once enough distinct rows are pending. Counts that cannot be written
+(for example while the database is locked) are kept for the next flush.
+
+On shutdown anything that still cannot be written is dropped, unless
+SPILL_DIR is set: each exiting process then writes its own spill file there
+(written under a temporary name and renamed into place), and the next flush
+of any process claims each file by renaming it before reading it, so every
+spilled count is replayed exactly once even when workers start and stop
+together.
+
+Models using the buffer need ``view_count`` and ``trending_score`` fields.
+``trending_score`` holds time-decayed views scaled to a fixed epoch, in log
+space: a view at ``now`` weighs ``2 ** trending_exponent(now)`` and the
+stored value is the log2 of the sum of the weights (0 for no views). Ordering
+by it is the same as ordering by views decayed to the present, without ever
+rewriting old rows, and unlike the weights themselves it does not overflow
+however short the half-life. ``2 ** (trending_score - trending_exponent())``
+is the current score.
+
+Settings (all optional)::
+
+    VIEW_COUNTERS = {
+        'FLUSH_INTERVAL': 10,        # seconds between flushes
+        'MAX_PENDING': 1000,         # distinct rows before an early flush
+        'TRENDING_HALF_LIFE': 604800,
+        'BACKGROUND_FLUSH': True,    # flush from a thread, not only on increments
+        'SPILL_DIR': None,           # directory keeping counts across restarts
+    }
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Greatest, Log, Power
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+EPOCH = 1735689600  # 2025-01-01T00:00:00Z
+SPILL_SUFFIX = '.json'
+
+
+def _config(name, default):
+    return getattr(settings, 'VIEW_COUNTERS', {}).get(name, default)
+
+
+def trending_exponent(now=None):
+    """log2 of the weight of a view at ``now`` relative to a view at the epoch"""
+    now = time.time() if now is None else now
+    return (now - EPOCH) / _config('TRENDING_HALF_LIFE', 7 * 24 * 3600)
+
+
+def add_trending_weight(weight):
+    """
+    ``trending_score`` after adding ``weight`` (log2 of the added views'
+    weight) to it, as log2(2**a + 2**b) = max(a, b) + log2(1 + 2**-|a - b|)
+    """
+    score, weight = F('trending_score'), Value(weight)
+    return Case(
+        When(trending_score=0, then=weight),
+        default=Greatest(score, weight) + Log(2, 1 + Power(2, -Abs(score - weight))),
+        output_field=FloatField(),
+    )
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self._flusher_pid = None
+        self._stopping = None
+
+    def incr(self, model, pk, amount=1):
+        self._start_flusher()
+        with self._lock:
+            self._pending[(model._meta.label, int(pk))] += amount
+            due = (
+                len(self._pending) >= _config('MAX_PENDING', 1000)
+                or time.monotonic() - self._last_flush >= _config('FLUSH_INTERVAL', 10)
+            )
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # Counting a view must never fail the request
+                logger.exception("View counter flush failed")
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+        return pending
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, amount in pending.items():
+                self._pending[key] += amount
+
+    def discard(self):
+        """Drop pending counts, returns how many rows they were for"""
+        return len(self._take())
+
+    def _start_flusher(self):
+        # One thread per process, started again in processes forked later
+        if not _config('BACKGROUND_FLUSH', True) or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._stopping = threading.Event()
+            self._flusher = threading.Thread(
+                target=self._run_flusher, args=(self._stopping,), name='view-counter-flush', daemon=True
+            )
+            self._flusher.start()
+
+    def _run_flusher(self, stopping):
+        while not stopping.wait(_config('FLUSH_INTERVAL', 10)):
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("View counter flush failed")
+        connections.close_all()
+
+    def stop(self):
+        """Stop the background flush thread"""
+        with self._lock:
+            stopping, flusher = self._stopping, self._flusher
+            self._flusher = self._flusher_pid = self._stopping = None
+        if stopping:
+            stopping.set()
+        if flusher and flusher.is_alive() and flusher is not threading.current_thread():
+            flusher.join(_config('FLUSH_INTERVAL', 10))
+
+    def flush(self):
+        """Write pending counts to the database, returns the number of rows updated"""
+        # Only one thread flushes at a time, others keep buffering
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            pending = self._take()
+            for key, amount in self._read_spill().items():
+                pending[key] += amount
+            if not pending:
+                return 0
+            try:
+                updated = self._write(pending)
+            except Exception:
+                logger.warning("Could not flush %d view counters, retrying later", len(pending), exc_info=True)
+                metrics.incr('counters.flush_failed')
+                self._restore(pending)
+                return 0
+            metrics.incr('counters.flushed', len(pending))
+            return updated
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, pending):
+        exponent = trending_exponent()
+        # Group rows receiving the same increment so each group is one UPDATE
+        groups = defaultdict(list)
+        for (label, pk), amount in pending.items():
+            groups[(label, amount)].append(pk)
+
+        updated = 0
+        with transaction.atomic():
+            for (label, amount), pks in groups.items():
+                model = apps.get_model(label)
+                updated += model._default_manager.filter(pk__in=pks).update(
+                    view_count=F('view_count') + amount,
+                    trending_score=add_trending_weight(math.log2(amount) + exponent),
+                )
+        return updated
+
+    def _read_spill(self):
+        """Counts spilled by processes that have exited"""
+        directory = _config('SPILL_DIR', None)
+        pending = defaultdict(int)
+        if not directory or not os.path.isdir(directory):
+            return pending
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(SPILL_SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            claimed = f"{path}.{os.getpid()}.claimed"
+            try:
+                # Renaming is atomic, so exactly one process claims each file
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(claimed) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                logger.exception("Could not read view counter spill file %s", claimed)
+                continue
+            for label, pk, amount in rows:
+                pending[(label, pk)] += amount
+            os.remove(claimed)
+        return pending
+
+    def _write_spill(self, directory, pending):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}-{secrets.token_hex(4)}{SPILL_SUFFIX}")
+        # Written under another name so readers never see a partial file
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump([[label, pk, amount] for (label, pk), amount in pending.items()], f)
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def shutdown(self):
+        """Flush on process exit, spilling counts to disk if the database is unavailable"""
+        self.stop()
+        self.flush()
+        pending = self._take()
+        if not pending:
+            return
+        directory = _config('SPILL_DIR', None)
+        if not directory:
+            logger.error("Dropping %d unflushed view counters on shutdown", len(pending))
+            return
+        try:
+            self._write_spill(directory, pending)
+        except OSError:
+            logger.exception("Dropping %d unflushed view counters on shutdown", len(pending))
+
+
+view_counter = CounterBuffer()
+atexit.register(view_counter.shutdown)
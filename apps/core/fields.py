@@ -0,0 +1,140 @@
+"""
+Compressed text storage.
+
+CompressedTextField behaves like a TextField from Python but stores its value
+zlib-compressed in a binary column. Values loaded from the database stay
+compressed until the attribute is first accessed on the instance, so rows
+that are loaded but whose text is never read pay no decompression cost.
+
+The ``contains`` and ``icontains`` lookups still work on SQLite: they compare
+against ``decompress_text(column)``, a SQL function registered on every
+connection, so each candidate row is decompressed by the database. Filter on
+an indexed column first (e.g. the owner) to keep the number of rows small.
+"""
+import zlib
+
+from django.db import models
+from django.db.models import lookups
+from django.db.models.query_utils import DeferredAttribute
+
+COMPRESSION_LEVEL = 6
+
+
+class CompressedValue:
+    """Compressed text as loaded from the database, decompressed on demand"""
+    __slots__ = ['data']
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def decompress(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def __str__(self):
+        return self.decompress()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, CompressedValue):
+            return self.data == other.data
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.data)
+
+
+def compress(text):
+    return zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Decompresses the stored value the first time it is read"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = value.decompress()
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    descriptor_class = CompressedTextDescriptor
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            # Rows written before the column was compressed
+            return value
+        return CompressedValue(value)
+
+    def to_python(self, value):
+        if isinstance(value, CompressedValue):
+            return value.decompress()
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        # Avoid decompressing a value only to compress it again
+        if self.attname in model_instance.__dict__:
+            return model_instance.__dict__[self.attname]
+        return super().pre_save(model_instance, add)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, CompressedValue):
+            return value.data
+        return compress(str(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+
+def decompress_text(data):
+    """SQL function returning the text of a compressed column value"""
+    if data is None or isinstance(data, str):
+        return data
+    return zlib.decompress(data).decode('utf-8')
+
+
+def install_sql_functions(sender, connection, **kwargs):
+    # Receiver for connection_created, see CoreConfig.ready()
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('decompress_text', 1, decompress_text, deterministic=True)
+
+
+class DecompressedPatternLookup:
+    # The search term is plain text, not a value to compress
+    prepare_rhs = False
+
+    def process_lhs(self, compiler, connection, lhs=None):
+        if connection.vendor != 'sqlite':
+            raise NotImplementedError(f"{self.lookup_name} on compressed text is only supported on SQLite")
+        sql, params = super().process_lhs(compiler, connection, lhs)
+        return f"decompress_text({sql})", params
+
+
+@CompressedTextField.register_lookup
+class CompressedContains(DecompressedPatternLookup, lookups.Contains):
+    pass
+
+
+@CompressedTextField.register_lookup
+class CompressedIContains(DecompressedPatternLookup, lookups.IContains):
+    pass
@@ -0,0 +1,171 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+PROFILES = {
+    # Django's defaults: rollback journal, deferred transactions, a new
+    # connection per request, reads and writes on one connection
+    'stock': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+        'READ_OPTIONS': None,
+    },
+    # This project's settings, see apps/core/sqlite/base.py
+    'tuned': {
+        'ENGINE': 'apps.core.sqlite',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {},
+        'READ_OPTIONS': {'read_only': True},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent read/write throughput of the stock SQLite backend "
+        "against the tuned one on a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads (default: %(default)s)')
+        parser.add_argument('--writers', type=int, default=4, help='Writer threads (default: %(default)s)')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per profile (default: %(default)s)')
+        parser.add_argument('--rows', type=int, default=20000, help='Rows seeded before measuring (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        directory = Path(tempfile.mkdtemp(prefix='benchmark_sqlite-'))
+        try:
+            results = {name: self.run(name, directory, options) for name in PROFILES}
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(f"{'profile':<8} {'reads/s':>10} {'writes/s':>10} {'errors':>8} {'p99 write ms':>13}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<8} {result['reads'] / options['duration']:>10.0f} "
+                f"{result['writes'] / options['duration']:>10.0f} {result['errors']:>8} "
+                f"{result['p99_write'] * 1000:>13.1f}"
+            )
+        stock, tuned = results['stock'], results['tuned']
+        self.stdout.write(self.style.SUCCESS(
+            f"Tuned: {tuned['reads'] / max(stock['reads'], 1):.1f}x reads, "
+            f"{tuned['writes'] / max(stock['writes'], 1):.1f}x writes"
+        ))
+
+    def add_alias(self, alias, profile, path, options):
+        connections.settings[alias] = dict(
+            connections.settings['default'],
+            ENGINE=profile['ENGINE'],
+            NAME=str(path),
+            CONN_MAX_AGE=profile['CONN_MAX_AGE'],
+            CONN_HEALTH_CHECKS=profile['CONN_MAX_AGE'] > 0,
+            OPTIONS=options,
+            TEST={},
+        )
+
+    def run(self, name, directory, options):
+        profile = PROFILES[name]
+        path = directory / f"{name}.sqlite3"
+        write_alias = f"benchmark_{name}"
+        read_alias = f"benchmark_{name}_read"
+        self.add_alias(write_alias, profile, path, profile['OPTIONS'])
+        if profile['READ_OPTIONS'] is None:
+            read_alias = write_alias
+        else:
+            self.add_alias(read_alias, profile, path, profile['READ_OPTIONS'])
+
+        self.seed(write_alias, options['rows'])
+        users = max(options['rows'] // 100, 1)
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'errors': 0, 'write_times': []}
+
+        def request(alias, work):
+            # What Django does around each request
+            connection = connections[alias]
+            connection.close_if_unusable_or_obsolete()
+            try:
+                work(connection)
+            finally:
+                connection.close_if_unusable_or_obsolete()
+
+        def read(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, name, views FROM bench WHERE user_id = %s ORDER BY id DESC LIMIT 20",
+                    [random.randrange(users)],
+                )
+                cursor.fetchall()
+
+        def write(connection):
+            user_id = random.randrange(users)
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    # Validation reads, then the writes, as in a model save
+                    cursor.execute("SELECT COUNT(*) FROM bench WHERE user_id = %s", [user_id])
+                    cursor.execute(
+                        "INSERT INTO bench (user_id, name, views) VALUES (%s, %s, 0)",
+                        [user_id, f"recipe {random.random()}"],
+                    )
+                    cursor.execute("UPDATE bench SET views = views + 1 WHERE id = %s", [random.randrange(1, options['rows'])])
+
+        def worker(alias, work, kind):
+            try:
+                while time.monotonic() < deadline:
+                    started = time.monotonic()
+                    try:
+                        request(alias, work)
+                    except DatabaseError:
+                        with lock:
+                            result['errors'] += 1
+                        continue
+                    elapsed = time.monotonic() - started
+                    with lock:
+                        result[kind] += 1
+                        if kind == 'writes':
+                            result['write_times'].append(elapsed)
+            finally:
+                connections[alias].close()
+
+        threads = [
+            threading.Thread(target=worker, args=(read_alias, read, 'reads'))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=(write_alias, write, 'writes'))
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        write_times = sorted(result.pop('write_times')) or [0]
+        result['p99_write'] = write_times[int(len(write_times) * 0.99)]
+        self.stdout.write(
+            f"{name}: {result['reads']} reads, {result['writes']} writes, {result['errors']} errors"
+        )
+        return result
+
+    def seed(self, alias, rows):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "name TEXT NOT NULL, views INTEGER NOT NULL)"
+            )
+            cursor.execute("CREATE INDEX bench_user ON bench (user_id, id)")
+        users = max(rows // 100, 1)
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO bench (user_id, name, views) VALUES (%s, %s, 0)",
+                    [(i % users, f"recipe {i}") for i in range(rows)],
+                )
+        connection.close()
@@ -0,0 +1,31 @@
+"""
+In-process counters for operational metrics.
+
+Counters are per worker process and reset on restart. They are cheap enough
+to increment on every request and are exposed through /api/metrics/.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
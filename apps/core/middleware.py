@@ -0,0 +1,75 @@
+"""
+Load shedding for when the worker is saturated.
+
+ConcurrencyLimitMiddleware caps the number of requests a process works on at
+once. Beyond the global limit requests are rejected immediately with a 503,
+and a single client holding too many requests in flight gets a 429, both with
+a Retry-After header, instead of queueing behind work that will time out
+anyway.
+
+Settings (all optional)::
+
+    LOAD_SHEDDING = {
+        'MAX_IN_FLIGHT': 64,
+        'MAX_IN_FLIGHT_PER_CLIENT': 8,
+        'RETRY_AFTER': 1,
+        'EXEMPT_PATHS': ['/admin/'],
+    }
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import metrics
+
+
+def _config(name, default):
+    return getattr(settings, 'LOAD_SHEDDING', {}).get(name, default)
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.per_client = defaultdict(int)
+
+    def client_key(self, request):
+        # Runs before DRF authentication, so identify clients by credentials
+        auth = request.META.get('HTTP_AUTHORIZATION')
+        if auth:
+            return auth
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session:
+            return session
+        return request.META.get('REMOTE_ADDR', '')
+
+    def reject(self, status, message, counter):
+        metrics.incr(counter)
+        response = JsonResponse({'error': message}, status=status)
+        response['Retry-After'] = str(_config('RETRY_AFTER', 1))
+        return response
+
+    def __call__(self, request):
+        if any(request.path.startswith(path) for path in _config('EXEMPT_PATHS', ['/admin/'])):
+            return self.get_response(request)
+
+        client = self.client_key(request)
+        with self.lock:
+            if self.in_flight >= _config('MAX_IN_FLIGHT', 64):
+                return self.reject(503, 'Server is busy, try again shortly', 'load_shed.rejected')
+            if self.per_client[client] >= _config('MAX_IN_FLIGHT_PER_CLIENT', 8):
+                return self.reject(429, 'Too many concurrent requests', 'load_shed.client_rejected')
+            self.in_flight += 1
+            self.per_client[client] += 1
+
+        try:
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.per_client[client] -= 1
+                if not self.per_client[client]:
+                    del self.per_client[client]
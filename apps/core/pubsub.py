@@ -0,0 +1,158 @@
+"""
+In-process publish/subscribe for change feeds.
+
+Publishers are ordinary (synchronous) Django code such as signal receivers.
+Subscribers are asyncio tasks, typically long-lived streaming responses, that
+each own a bounded queue on their event loop. Every channel keeps a short
+history of recent events so a client that reconnects with the id of the last
+event it saw can be sent what it missed.
+
+Events only reach subscribers connected to the same process. Event ids start
+with a token identifying the process, so a client reconnecting to another
+process (or after a restart) is told to reload instead of silently missing
+events.
+"""
+import asyncio
+import itertools
+import secrets
+import threading
+from collections import OrderedDict, deque
+
+HISTORY_SIZE = 256
+MAX_CHANNELS = 10000
+QUEUE_SIZE = 100
+
+RESET = 'reset'
+
+
+class Event:
+    __slots__ = ['id', 'seq', 'type', 'data']
+
+    def __init__(self, id, seq, type, data):
+        self.id = id
+        self.seq = seq
+        self.type = type
+        self.data = data
+
+
+class _History:
+    __slots__ = ['events', 'dropped_seq']
+
+    def __init__(self):
+        self.events = deque(maxlen=HISTORY_SIZE)
+        self.dropped_seq = 0
+
+    def append(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped_seq = self.events[0].seq
+        self.events.append(event)
+
+
+class Subscription:
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up, end the stream so the client reconnects
+            # and catches up from the history
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self):
+        """Next event, or None once the subscription has overflowed"""
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self):
+        self.boot = secrets.token_hex(4)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._history = OrderedDict()
+        self._evicted_seq = 0
+        self._subscribers = {}
+
+    def publish(self, channel, type, data):
+        with self._lock:
+            seq = next(self._seq)
+            event = Event(f"{self.boot}-{seq}", seq, type, data)
+            history = self._history.pop(channel, None) or _History()
+            history.append(event)
+            self._history[channel] = history
+            if len(self._history) > MAX_CHANNELS:
+                _, evicted = self._history.popitem(last=False)
+                self._evicted_seq = max(self._evicted_seq, evicted.events[-1].seq)
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, channel, last_event_id=None):
+        """
+        Subscribe the running event loop to ``channel``.
+
+        Events published after ``last_event_id`` that are still in the
+        channel history are queued first. If they cannot all be replayed a
+        RESET event is queued instead, telling the client to reload.
+        """
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            missed = self._missed(channel, last_event_id) if last_event_id else []
+        for event in missed:
+            subscription.queue.put_nowait(event)
+        return subscription
+
+    def _missed(self, channel, last_event_id):
+        boot, _, seq = last_event_id.partition('-')
+        history = self._history.get(channel)
+        if boot != self.boot or not seq.isdigit():
+            return [Event(None, 0, RESET, {})]
+        seq = int(seq)
+        if history is None:
+            if seq < self._evicted_seq:
+                # The channel's history was evicted, events may have been lost
+                return [Event(None, 0, RESET, {})]
+            return []
+        if history.dropped_seq > seq:
+            # Events the client has not seen have already been discarded
+            return [Event(None, 0, RESET, {})]
+        missed = [event for event in history.events if event.seq > seq]
+        if len(missed) > QUEUE_SIZE:
+            return [Event(None, 0, RESET, {})]
+        return missed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+broker = Broker()
@@ -0,0 +1,128 @@
+"""
+Per-process cache of rendered API responses, keyed by version counters.
+
+Each cache key embeds the current versions of the namespaces the response
+depends on (see ``namespace_version`` in apps/core/cache.py), for instance
+the recipe and the catalog of categories and ingredients. Bumping a version
+with ``invalidate`` makes every key built from the old one unreachable, so
+nothing has to be deleted. Stale entries simply age out of the LRU.
+
+Responses are stored as rendered JSON bytes in process memory, so a hit
+costs one version lookup and a dict lookup, with no database query or
+serialization. Memory is bounded by a byte budget. Versions live in the
+Django cache, which must be shared by all worker processes (see CACHES in
+settings) so that a change made in one process invalidates the entries of
+all of them. With a per-process cache the others would keep serving stale
+responses until their entries expire.
+
+Settings (all optional)::
+
+    RESPONSE_CACHE = {
+        'MAX_BYTES': 32 * 1024 * 1024,
+        'TTL': 300,     # seconds, bounds staleness of view counts
+    }
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+from .cache import namespace_versions
+
+
+def _config(name, default):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, default)
+
+
+class ResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                metrics.incr('response_cache.hit')
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+        metrics.incr('response_cache.miss')
+        return None
+
+    def set(self, key, content):
+        max_bytes = _config('MAX_BYTES', 32 * 1024 * 1024)
+        if len(content) > max_bytes // 10:
+            # One response should not flush out everything else
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (content, time.monotonic() + _config('TTL', 300))
+            self._bytes += len(content)
+            while self._bytes > max_bytes:
+                self._remove(next(iter(self._entries)))
+                metrics.incr('response_cache.evicted')
+
+    def _remove(self, key):
+        content, _ = self._entries.pop(key)
+        self._bytes -= len(content)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        hits = metrics.get('response_cache.hit')
+        misses = metrics.get('response_cache.miss')
+        with self._lock:
+            return {
+                'response_cache.entries': len(self._entries),
+                'response_cache.bytes': self._bytes,
+                'response_cache.max_bytes': _config('MAX_BYTES', 32 * 1024 * 1024),
+                'response_cache.hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(key_func):
+    """
+    Cache the JSON responses of a viewset method.
+
+    ``key_func(view, request, *args, **kwargs)`` returns ``(namespaces,
+    parts)``: the namespaces whose versions the response depends on and the
+    other values identifying it, such as the user and the path. Only 200
+    responses rendered as JSON are cached.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if getattr(request, 'accepted_renderer', None) is None or request.accepted_renderer.format != 'json':
+                return view_method(self, request, *args, **kwargs)
+
+            namespaces, parts = key_func(self, request, *args, **kwargs)
+            versions = namespace_versions(namespaces)
+            key = ':'.join(str(part) for part in [view_method.__qualname__, *parts, *versions])
+            content = response_cache.get(key)
+            if content is not None:
+                response = HttpResponse(content, content_type='application/json')
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response_cache.set(key, JSONRenderer().render(response.data))
+            return response
+        return wrapper
+    return decorator
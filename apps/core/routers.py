@@ -0,0 +1,33 @@
+"""
+Database router sending reads to a read-only connection.
+
+The 'replica' alias opens the same SQLite file read-only (see
+apps/core/sqlite/base.py). Under WAL, reads on it run alongside writes on
+'default' and see everything committed so far, so there is no replication
+lag. Each thread keeps its own persistent connection per alias, so the
+server's worker threads form the reader pool.
+
+Reads inside a transaction on 'default' stay on it so that they see the
+transaction's own uncommitted writes.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'replica'
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if READ_ALIAS not in settings.DATABASES or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """One request of a batch, see apps/core/batch.py"""
+    METHOD_CHOICES = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+    id = serializers.CharField(max_length=100, required=False)
+    method = serializers.ChoiceField(choices=METHOD_CHOICES, default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        max_requests = self.context.get('max_requests', 20)
+        if len(value) > max_requests:
+            raise serializers.ValidationError(f'At most {max_requests} requests per batch')
+        return value
@@ -0,0 +1,103 @@
+"""
+SQLite backend tuned for serving concurrent requests.
+
+Use it with ``'ENGINE': 'apps.core.sqlite'``. On top of Django's backend it:
+
+- applies PRAGMAs on every new connection: WAL journaling so readers never
+  block the writer, ``synchronous=NORMAL`` (durable across application
+  crashes, the last commits may be lost on power failure), a busy timeout,
+  and larger page cache and memory map sizes;
+- starts transactions with ``BEGIN IMMEDIATE``, taking the write lock up
+  front so that concurrent transactions wait in the busy handler instead of
+  failing with "database is locked" when they try to upgrade a read lock;
+- retries statements that still hit a locked database after the busy
+  timeout, with exponential backoff, when they run outside a transaction
+  (inside one, the whole transaction would have to be retried);
+- opens the database read-only when ``OPTIONS['read_only']`` is set, for a
+  reader alias that queries can be routed to (see apps/core/routers.py).
+
+Options beyond those of ``sqlite3.connect``::
+
+    'OPTIONS': {
+        'read_only': False,
+        'pragmas': {'cache_size': -131072},   # merged over DEFAULT_PRAGMAS
+        'busy_retries': 3,
+    }
+"""
+import random
+import sqlite3
+import time
+from urllib.parse import quote
+
+from django.db.backends.sqlite3 import base
+
+from apps.core import metrics
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,       # milliseconds
+    'cache_size': -65536,       # negative means KiB, so 64 MiB
+    'mmap_size': 268435456,     # 256 MiB
+    'temp_store': 'memory',
+}
+# journal_mode is a property of the database file, a read-only connection
+# can neither change it nor needs to
+READ_ONLY_SKIPPED_PRAGMAS = {'journal_mode'}
+DEFAULT_BUSY_RETRIES = 3
+RETRY_BASE_DELAY = 0.05
+
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and 'database is locked' in str(error)
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    # executemany() is not retried, its parameters may be a generator that
+    # cannot be replayed
+    busy_retries = DEFAULT_BUSY_RETRIES
+
+    def execute(self, query, params=None):
+        # A statement run outside a transaction is its own transaction, so it
+        # is safe to repeat. This includes the BEGIN starting a transaction.
+        retries = 0 if self.connection.in_transaction else self.busy_retries
+        for attempt in range(retries + 1):
+            try:
+                return super().execute(query, params)
+            except sqlite3.OperationalError as error:
+                if attempt == retries or not is_busy(error):
+                    raise
+                metrics.incr('db.busy_retries')
+                time.sleep(RETRY_BASE_DELAY * 2 ** attempt * (1 + random.random()))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Our own options are not sqlite3.connect() arguments
+        for key in ('read_only', 'pragmas', 'busy_retries'):
+            kwargs.pop(key, None)
+        if self.settings_dict['OPTIONS'].get('read_only') and not self.is_in_memory_db():
+            kwargs['database'] = f"file:{quote(str(kwargs['database']))}?mode=ro"
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        pragmas = dict(DEFAULT_PRAGMAS, **options.get('pragmas', {}))
+        for name, value in pragmas.items():
+            if options.get('read_only') and name in READ_ONLY_SKIPPED_PRAGMAS:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.busy_retries = self.settings_dict['OPTIONS'].get('busy_retries', DEFAULT_BUSY_RETRIES)
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict['OPTIONS'].get('read_only'):
+            self.cursor().execute("BEGIN")
+        else:
+            self.cursor().execute("BEGIN IMMEDIATE")
@@ -0,0 +1,77 @@
+"""
+Test runner keeping process-wide state away from the real database.
+
+View counters are flushed from a background thread and at exit. In a test
+run both would happen after the test databases are destroyed, when the
+connection settings point at the real database again. Tests run with the
+background flush and spill files disabled, and counts still buffered when
+the suite ends are dropped instead of being flushed. Tests also use a local
+memory cache, so that clearing it does not touch the cache shared by the
+running server.
+
+Test cases that go through views, and so through caches, throttles and
+view counters, derive from the TestCase classes below, which start every
+test with that state empty.
+"""
+import atexit
+
+from django import test
+from django.conf import settings
+from django.core.cache import cache
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .counters import view_counter
+from .response_cache import response_cache
+from .throttling import local_store
+
+
+def reset_process_state():
+    """Empty the caches and throttle buckets and drop buffered view counts"""
+    cache.clear()
+    local_store.clear()
+    response_cache.clear()
+    view_counter.discard()
+
+
+class ProcessStateMixin:
+    def _pre_setup(self):
+        reset_process_state()
+        super()._pre_setup()
+
+    def _post_teardown(self):
+        super()._post_teardown()
+        # Views buffer counts for rows that are rolled back with the test
+        view_counter.discard()
+
+
+class SimpleTestCase(ProcessStateMixin, test.SimpleTestCase):
+    pass
+
+
+class TransactionTestCase(ProcessStateMixin, test.TransactionTestCase):
+    pass
+
+
+class TestCase(ProcessStateMixin, test.TestCase):
+    pass
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._overrides = override_settings(
+            VIEW_COUNTERS=dict(getattr(settings, 'VIEW_COUNTERS', {}), BACKGROUND_FLUSH=False, SPILL_DIR=None),
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        self._overrides.enable()
+
+    def teardown_databases(self, old_config, **kwargs):
+        view_counter.stop()
+        view_counter.discard()
+        atexit.unregister(view_counter.shutdown)
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        super().teardown_test_environment(**kwargs)
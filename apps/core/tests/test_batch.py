@@ -0,0 +1,91 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from apps.core import batch
+from apps.core.test_runner import TestCase, TransactionTestCase
+from apps.recipes.models import Recipe
+
+
+def create_recipe(user, name):
+    return Recipe.objects.create(
+        user=user, name=name, description=name, instructions='Bake.', prep_time=10, cook_time=30,
+    )
+
+
+class BatchTestMixin:
+    def post_batch(self, requests, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'} if token else {}
+        return self.client.post('/api/batch/', {'requests': requests}, content_type='application/json', **headers)
+
+
+class BatchTests(BatchTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.bread = create_recipe(cls.user, 'Bread')
+        cls.other_recipe = create_recipe(User.objects.create_user('other'), 'Cake')
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.post_batch([{'path': '/api/recipes/'}]).status_code, 401)
+
+    def test_writes_are_seen_by_later_reads(self):
+        response = self.post_batch([
+            {'id': 'rename', 'method': 'PATCH', 'path': f'/api/recipes/{self.bread.pk}/', 'body': {'name': 'Brioche'}},
+            {'id': 'read', 'path': f'/api/recipes/{self.bread.pk}/'},
+        ], self.token)
+        self.assertEqual(response.status_code, 200)
+        rename, read = response.data['responses']
+        self.assertEqual((rename['id'], rename['status']), ('rename', 200))
+        self.assertEqual((read['id'], read['status']), ('read', 200))
+        self.assertEqual(read['body']['name'], 'Brioche')
+
+    def test_sub_requests_are_authenticated_as_the_batch_user(self):
+        response = self.post_batch([{'path': f'/api/recipes/{self.other_recipe.pk}/'}], self.token)
+        self.assertEqual(response.data['responses'][0]['status'], 404)
+
+    def test_rejected_paths(self):
+        response = self.post_batch([
+            {'path': '/admin/'},
+            {'path': '/api/batch/', 'method': 'POST', 'body': {'requests': []}},
+            {'path': '/api/no-such-endpoint/'},
+        ], self.token)
+        self.assertEqual([item['status'] for item in response.data['responses']], [400, 400, 404])
+
+    @override_settings(BATCH_REQUESTS={'MAX_REQUESTS': 2})
+    def test_batch_size_is_limited(self):
+        response = self.post_batch([{'path': '/api/recipes/'}] * 3, self.token)
+        self.assertEqual(response.status_code, 400)
+
+    def test_failing_sub_request_does_not_fail_the_batch(self):
+        with mock.patch('apps.recipes.views.RecipeViewSet.list', side_effect=RuntimeError), \
+                self.assertLogs('apps.core.batch', 'ERROR'):
+            response = self.post_batch([
+                {'path': '/api/recipes/'},
+                {'method': 'PATCH', 'path': f'/api/recipes/{self.bread.pk}/', 'body': {'servings': 2}},
+            ], self.token)
+        self.assertEqual([item['status'] for item in response.data['responses']], [500, 200])
+
+
+class ConcurrentReadTests(BatchTestMixin, TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_consecutive_reads_run_concurrently_in_order(self):
+        user = User.objects.create_user('cook')
+        token = Token.objects.create(user=user)
+        recipes = [create_recipe(user, name) for name in ['Bread', 'Cake', 'Soup']]
+        threads = set()
+        dispatch = batch.dispatch
+
+        def record_thread(*args):
+            threads.add(threading.current_thread().name)
+            return dispatch(*args)
+
+        with mock.patch('apps.core.batch.dispatch', side_effect=record_thread):
+            response = self.post_batch([{'path': f'/api/recipes/{recipe.pk}/'} for recipe in recipes], token)
+        self.assertEqual([item['body']['name'] for item in response.data['responses']], ['Bread', 'Cake', 'Soup'])
+        self.assertTrue(all(name.startswith('batch') for name in threads))
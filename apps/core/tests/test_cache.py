@@ -0,0 +1,112 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from apps.categories.models import Category
+from apps.core import cache as listing_cache
+from apps.core.cache import get_or_compute, invalidate, namespace_version
+from apps.core.test_runner import SimpleTestCase, TestCase
+from apps.ingredients.models import Ingredient
+from apps.recipes.models import Recipe
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def test_value_is_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'value'
+
+        self.assertEqual(get_or_compute('key', compute, ttl=60, beta=0), 'value')
+        self.assertEqual(get_or_compute('key', compute, ttl=60, beta=0), 'value')
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_misses_share_one_computation(self):
+        calls = []
+        start = threading.Barrier(8)
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        def worker():
+            start.wait()
+            results.append(get_or_compute('key', compute, ttl=60, beta=0))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_value_is_served_while_another_caller_refreshes(self):
+        cache.set('key', {'value': 'old', 'expires': time.time() - 1, 'delta': 0}, 300)
+        # Held by the caller refreshing the entry
+        cache.add('key:lock', 1, 30)
+        self.assertEqual(get_or_compute('key', lambda: 'new', ttl=60, stale_ttl=300, beta=0), 'old')
+
+    def test_expired_value_is_refreshed(self):
+        cache.set('key', {'value': 'old', 'expires': time.time() - 1, 'delta': 0}, 300)
+        self.assertEqual(get_or_compute('key', lambda: 'new', ttl=60, stale_ttl=300, beta=0), 'new')
+        self.assertEqual(get_or_compute('key', lambda: 'newer', ttl=60, stale_ttl=300, beta=0), 'new')
+
+    def test_value_too_old_to_serve_stale_is_recomputed(self):
+        cache.set('key', {'value': 'old', 'expires': time.time() - 400, 'delta': 0}, 300)
+        cache.add('key:lock', 1, 30)
+        # The lock belongs to a caller that never finishes, so stop waiting early
+        wait_timeout = listing_cache.WAIT_TIMEOUT
+        listing_cache.WAIT_TIMEOUT = 0.1
+        try:
+            self.assertEqual(get_or_compute('key', lambda: 'new', ttl=60, stale_ttl=300, beta=0), 'new')
+        finally:
+            listing_cache.WAIT_TIMEOUT = wait_timeout
+
+    def test_failed_computation_is_not_cached(self):
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            get_or_compute('key', fail, ttl=60)
+        self.assertIsNone(cache.get('key:lock'))
+        self.assertEqual(get_or_compute('key', lambda: 'value', ttl=60), 'value')
+
+
+class InvalidationTests(TestCase):
+    def test_version_changes_after_commit(self):
+        version = namespace_version('things')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            invalidate('things')
+        self.assertEqual(namespace_version('things'), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(namespace_version('things'), version)
+
+    def test_listing_is_cached_until_invalidated(self):
+        category = Category.objects.create(name='Dinner')
+        self.assertEqual(self.client.get(f'/api/categories/{category.pk}/recipes/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/categories/{category.pk}/recipes/').json(), [])
+
+        user = User.objects.create_user('cook', password='password123')
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                user=user, category=category, name='Stew', description='', instructions='Simmer',
+                prep_time=10, cook_time=60,
+            )
+        response = self.client.get(f'/api/categories/{category.pk}/recipes/')
+        self.assertEqual([recipe['name'] for recipe in response.json()], ['Stew'])
+
+    def test_listing_is_cached_per_host(self):
+        # Pagination links are absolute URLs
+        Ingredient.objects.bulk_create([Ingredient(name=f'Ingredient {i}') for i in range(25)])
+        first = self.client.get('/api/ingredients/', HTTP_HOST='localhost')
+        second = self.client.get('/api/ingredients/', HTTP_HOST='127.0.0.1')
+        self.assertTrue(first.json()['next'].startswith('http://localhost/'))
+        self.assertTrue(second.json()['next'].startswith('http://127.0.0.1/'))
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.core.counters import CounterBuffer, trending_exponent
+from apps.recipes.models import Recipe
+
+COUNTERS = {'FLUSH_INTERVAL': 3600, 'MAX_PENDING': 1000, 'BACKGROUND_FLUSH': False, 'SPILL_DIR': None}
+
+
+def create_recipes(count):
+    user = User.objects.create_user('cook', password='password123')
+    return [
+        Recipe.objects.create(user=user, name=f'Recipe {i}', description='', instructions='Cook', prep_time=1, cook_time=1)
+        for i in range(count)
+    ]
+
+
+@override_settings(VIEW_COUNTERS=COUNTERS)
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = CounterBuffer()
+        self.recipes = create_recipes(3)
+        self.spill_dir = tempfile.mkdtemp()
+
+    def view_counts(self):
+        return list(Recipe.objects.order_by('pk').values_list('view_count', flat=True))
+
+    def test_increments_are_buffered(self):
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.buffer.incr(Recipe, self.recipes[0].pk)
+        self.assertEqual(self.buffer.pending(), {('recipes.Recipe', self.recipes[0].pk): 5})
+        self.assertEqual(self.view_counts(), [0, 0, 0])
+
+    def test_flush_writes_one_update_per_distinct_increment(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk, 2)
+        self.buffer.incr(Recipe, self.recipes[1].pk, 2)
+        self.buffer.incr(Recipe, self.recipes[2].pk, 1)
+        # Savepoint, two UPDATEs, release
+        with self.assertNumQueries(4):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.view_counts(), [2, 2, 1])
+        self.assertEqual(self.buffer.pending(), {})
+
+    def current_trending_score(self, recipe):
+        score = Recipe.objects.get(pk=recipe.pk).trending_score
+        return 2 ** (score - trending_exponent())
+
+    def test_trending_score_is_scaled_to_the_epoch(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk, 3)
+        self.buffer.flush()
+        self.assertAlmostEqual(self.current_trending_score(self.recipes[0]), 3, places=3)
+        self.buffer.incr(Recipe, self.recipes[0].pk, 2)
+        self.buffer.flush()
+        self.assertAlmostEqual(self.current_trending_score(self.recipes[0]), 5, places=3)
+        self.assertEqual(Recipe.objects.get(pk=self.recipes[1].pk).trending_score, 0)
+
+    @override_settings(VIEW_COUNTERS=dict(COUNTERS, TRENDING_HALF_LIFE=60))
+    def test_short_half_life_does_not_overflow(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk)
+        self.buffer.flush()
+        self.assertAlmostEqual(self.current_trending_score(self.recipes[0]), 1, places=3)
+        # Views decay with the half-life
+        with mock.patch('apps.core.counters.time.time', return_value=time.time() + 120):
+            self.assertAlmostEqual(self.current_trending_score(self.recipes[0]), 0.25, places=3)
+
+    @override_settings(VIEW_COUNTERS=dict(COUNTERS, MAX_PENDING=2))
+    def test_many_pending_rows_flush_early(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk)
+        self.buffer.incr(Recipe, self.recipes[1].pk)
+        self.assertEqual(self.buffer.pending(), {})
+        self.assertEqual(self.view_counts(), [1, 1, 0])
+
+    def test_failed_flush_keeps_counts(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk)
+        with mock.patch.object(CounterBuffer, '_write', side_effect=DatabaseError), self.assertLogs('apps.core.counters', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.buffer.incr(Recipe, self.recipes[0].pk)
+        self.buffer.flush()
+        self.assertEqual(self.view_counts(), [2, 0, 0])
+
+    @override_settings(VIEW_COUNTERS=dict(COUNTERS, MAX_PENDING=1))
+    def test_unexpected_flush_errors_keep_counts_and_do_not_raise(self):
+        with mock.patch.object(CounterBuffer, '_write', side_effect=OverflowError), self.assertLogs('apps.core.counters', 'WARNING'):
+            self.buffer.incr(Recipe, self.recipes[0].pk)
+        self.assertEqual(self.buffer.pending(), {('recipes.Recipe', self.recipes[0].pk): 1})
+        with mock.patch.object(CounterBuffer, 'flush', side_effect=RuntimeError), self.assertLogs('apps.core.counters', 'ERROR'):
+            self.buffer.incr(Recipe, self.recipes[0].pk)
+
+    def test_shutdown_without_spill_dir_drops_unwritable_counts(self):
+        self.buffer.incr(Recipe, self.recipes[0].pk)
+        with mock.patch.object(CounterBuffer, '_write', side_effect=DatabaseError), self.assertLogs('apps.core.counters', 'ERROR'):
+            self.buffer.shutdown()
+        self.assertEqual(self.buffer.pending(), {})
+
+    def test_spilled_counts_are_replayed_once(self):
+        with override_settings(VIEW_COUNTERS=dict(COUNTERS, SPILL_DIR=self.spill_dir)):
+            # Two processes exiting while the database is unavailable
+            for recipe in self.recipes[:2]:
+                exiting = CounterBuffer()
+                exiting.incr(Recipe, recipe.pk, 4)
+                with mock.patch.object(CounterBuffer, '_write', side_effect=DatabaseError), self.assertLogs('apps.core.counters', 'WARNING'):
+                    exiting.shutdown()
+            self.assertTrue(os.listdir(self.spill_dir))
+
+            self.buffer.flush()
+            self.buffer.flush()
+            CounterBuffer().flush()
+        self.assertEqual(self.view_counts(), [4, 4, 0])
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_concurrent_readers_claim_each_spill_file_once(self):
+        with override_settings(VIEW_COUNTERS=dict(COUNTERS, SPILL_DIR=self.spill_dir)):
+            for _ in range(50):
+                self.buffer._write_spill(self.spill_dir, {('recipes.Recipe', self.recipes[0].pk): 1})
+            readers = [CounterBuffer() for _ in range(4)]
+            results = []
+            threads = [threading.Thread(target=lambda reader=reader: results.append(reader._read_spill())) for reader in readers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sum(sum(result.values()) for result in results), 50)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+
+@override_settings(VIEW_COUNTERS=dict(COUNTERS, BACKGROUND_FLUSH=True, FLUSH_INTERVAL=0.05))
+class BackgroundFlushTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_counts_are_flushed_without_further_requests(self):
+        recipe = create_recipes(1)[0]
+        buffer = CounterBuffer()
+        self.addCleanup(buffer.stop)
+        # Older than the interval would be flushed by the increment itself
+        buffer._last_flush = time.monotonic() + 3600
+        buffer.incr(Recipe, recipe.pk)
+        deadline = time.monotonic() + 5
+        while buffer.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        buffer.stop()
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).view_count, 1)
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.utils import ConnectionHandler, OperationalError
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.core.routers import ReadReplicaRouter
+from apps.core.sqlite.base import base
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        self.handler = ConnectionHandler({})
+        self.addCleanup(self.handler.close_all)
+
+    def connect(self, alias, **options):
+        self.handler.settings[alias] = {'ENGINE': 'apps.core.sqlite', 'NAME': self.path, 'OPTIONS': options}
+        self.handler.configure_settings(self.handler.settings)
+        return self.handler[alias]
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        connection = self.connect('writer', pragmas={'cache_size': -1024})
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(connection, 'cache_size'), -1024)
+
+    def test_read_only_connection_rejects_writes(self):
+        writer = self.connect('writer')
+        with writer.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (name TEXT)")
+            cursor.execute("INSERT INTO item VALUES ('salt')")
+        reader = self.connect('reader', read_only=True)
+        with reader.cursor() as cursor:
+            cursor.execute("SELECT name FROM item")
+            self.assertEqual(cursor.fetchall(), [('salt',)])
+            with self.assertRaisesMessage(OperationalError, 'readonly'):
+                cursor.execute("INSERT INTO item VALUES ('pepper')")
+        self.assertEqual(self.pragma(reader, 'journal_mode'), 'wal')
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        first = self.connect('first')
+        second = self.connect('second', pragmas={'busy_timeout': 10}, busy_retries=0)
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (name TEXT)")
+        first._start_transaction_under_autocommit()
+        self.addCleanup(first.rollback)
+        # The second transaction fails at BEGIN, before it has read anything
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            second._start_transaction_under_autocommit()
+
+    def test_locked_statements_are_retried_outside_transactions(self):
+        connection = self.connect('writer', busy_retries=2)
+        connection.ensure_connection()
+        locked = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(base.SQLiteCursorWrapper, 'execute', side_effect=[locked, locked, 'done']) as execute, \
+                mock.patch('apps.core.sqlite.base.time.sleep') as sleep:
+            self.assertEqual(connection.create_cursor().execute("SELECT 1"), 'done')
+        self.assertEqual(execute.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_retries_give_up(self):
+        connection = self.connect('writer', busy_retries=1)
+        connection.ensure_connection()
+        locked = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(base.SQLiteCursorWrapper, 'execute', side_effect=locked) as execute, \
+                mock.patch('apps.core.sqlite.base.time.sleep'):
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.create_cursor().execute("SELECT 1")
+        self.assertEqual(execute.call_count, 2)
+
+    def test_locked_statements_are_not_retried_inside_transactions(self):
+        connection = self.connect('writer')
+        connection.ensure_connection()
+        connection.cursor().execute("BEGIN")
+        self.addCleanup(connection.rollback)
+        locked = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(base.SQLiteCursorWrapper, 'execute', side_effect=locked) as execute:
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.create_cursor().execute("SELECT 1")
+        self.assertEqual(execute.call_count, 1)
+
+
+class ReadReplicaRouterTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_reads_go_to_the_replica(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'replica')
+        self.assertEqual(router.db_for_write(User), 'default')
+        with CaptureQueriesContext(connections['replica']) as queries:
+            User.objects.filter(username='cook').exists()
+        self.assertEqual(len(queries), 1)
+
+    def test_reads_in_transactions_stay_on_default(self):
+        with transaction.atomic():
+            User.objects.create_user('cook')
+            self.assertEqual(ReadReplicaRouter().db_for_read(User), 'default')
+            self.assertTrue(User.objects.filter(username='cook').exists())
+
+    def test_only_default_is_migrated(self):
+        router = ReadReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
+        self.assertFalse(router.allow_migrate('replica', 'recipes'))
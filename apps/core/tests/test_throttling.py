@@ -0,0 +1,95 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.authtoken.models import Token
+
+from apps.core.middleware import ConcurrencyLimitMiddleware
+from apps.core.test_runner import SimpleTestCase, TestCase
+from apps.core.throttling import CacheBucketStore, LocalBucketStore
+
+
+class BucketStoreTests(SimpleTestCase):
+    def assert_all_or_nothing(self, store):
+        self.assertEqual(store.take([('client', 3, 5, 0.001), ('endpoint', 3, 3, 0.001)]), 0)
+        # The endpoint bucket cannot pay, so the client bucket is not charged
+        self.assertGreater(store.take([('client', 2, 5, 0.001), ('endpoint', 2, 3, 0.001)]), 0)
+        self.assertEqual(store.take([('client', 2, 5, 0.001)]), 0)
+        self.assertGreater(store.take([('client', 1, 5, 0.001)]), 0)
+
+    def test_local_store_charges_all_buckets_or_none(self):
+        self.assert_all_or_nothing(LocalBucketStore())
+
+    def test_cache_store_charges_all_buckets_or_none(self):
+        self.assert_all_or_nothing(CacheBucketStore())
+
+    def test_wait_is_time_until_every_bucket_can_pay(self):
+        store = LocalBucketStore()
+        store.take([('a', 1, 1, 1), ('b', 2, 2, 0.5)])
+        wait = store.take([('a', 1, 1, 1), ('b', 2, 2, 0.5)])
+        self.assertAlmostEqual(wait, 4, places=1)
+
+
+@override_settings(THROTTLING={'BACKEND': 'local', 'RATES': {'user': (5, 0.001), 'anon': (5, 0.001), 'endpoint': (2, 0.001)}})
+class CostBasedThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_rejected_requests_do_not_drain_the_client_bucket(self):
+        self.assertEqual(self.get('/api/recipes/my_recipes/').status_code, 200)
+        for _ in range(5):
+            response = self.get('/api/recipes/my_recipes/')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+        # The list costs 2 like my_recipes, the client bucket still has 3 tokens
+        self.assertEqual(self.get('/api/recipes/').status_code, 200)
+
+    def test_function_based_views_have_their_own_endpoint_buckets(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post('/api/auth/login/', {}).status_code, 400)
+        self.assertEqual(self.client.post('/api/auth/login/', {}).status_code, 429)
+        self.assertEqual(self.client.post('/api/auth/register/', {}).status_code, 400)
+
+    def test_expensive_actions_cost_more(self):
+        # Costs 5, capped at the endpoint capacity of 2
+        self.assertEqual(self.get('/api/recipes/search_by_ingredient/?ingredient=salt').status_code, 200)
+        self.assertEqual(self.get('/api/recipes/search_by_ingredient/?ingredient=salt').status_code, 429)
+
+
+@override_settings(LOAD_SHEDDING={'MAX_IN_FLIGHT': 2, 'MAX_IN_FLIGHT_PER_CLIENT': 1, 'RETRY_AFTER': 1, 'EXEMPT_PATHS': ['/admin/']})
+class ConcurrencyLimitMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.requests = []
+        self.middleware = ConcurrencyLimitMiddleware(self.nested)
+
+    def nested(self, request):
+        # Requests arriving while this one is in flight
+        if self.requests:
+            return self.middleware(self.requests.pop(0))
+        return HttpResponse('ok')
+
+    def test_client_over_its_limit_gets_429(self):
+        self.requests = [self.factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token a')]
+        response = self.middleware(self.factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token a'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_worker_over_its_limit_gets_503(self):
+        self.requests = [
+            self.factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token b'),
+            self.factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token c'),
+        ]
+        response = self.middleware(self.factory.get('/api/recipes/', HTTP_AUTHORIZATION='Token a'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.middleware.in_flight, 0)
+        self.assertEqual(dict(self.middleware.per_client), {})
+
+    def test_exempt_paths_are_not_limited(self):
+        self.requests = [self.factory.get('/admin/', HTTP_AUTHORIZATION='Token a')]
+        response = self.middleware(self.factory.get('/admin/', HTTP_AUTHORIZATION='Token a'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,178 @@
+"""
+Cost-aware request throttling.
+
+Every client gets a token bucket for the whole API and one per endpoint.
+A request spends tokens according to the view's ``throttle_costs`` (keyed by
+action name, default 1), so an ingredient search drains a bucket faster than
+a detail read, and deep pages cost more than the first ones because the
+database has to skip over every earlier row. A request is charged to both
+buckets, or to neither if either cannot pay, in which case it gets a 429
+with a Retry-After header.
+
+Buckets live in process memory by default. Set 'BACKEND' to 'cache' to keep
+them in the default Django cache so that limits are shared between worker
+processes; updates are then read-modify-write and may let a few extra
+requests through under contention.
+
+Settings (all optional)::
+
+    THROTTLING = {
+        'BACKEND': 'local',
+        # scope: (burst capacity in tokens, tokens refilled per second)
+        'RATES': {
+            'user': (120, 2),
+            'anon': (60, 1),
+            'endpoint': (60, 1),
+        },
+        'PAGE_COST_STEP': 10,
+    }
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+DEFAULT_RATES = {
+    'user': (120, 2),
+    'anon': (60, 1),
+    'endpoint': (60, 1),
+}
+MAX_LOCAL_BUCKETS = 10000
+
+
+def _config(name, default):
+    return getattr(settings, 'THROTTLING', {}).get(name, default)
+
+
+def _refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+def _wait(buckets, levels):
+    # Seconds until the emptiest bucket can pay, 0 if all of them can now
+    return max(
+        [(cost - tokens) / rate for (_, cost, _, rate), tokens in zip(buckets, levels) if tokens < cost],
+        default=0,
+    )
+
+
+class LocalBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, buckets):
+        """
+        Spend tokens from all of ``buckets``, (key, cost, capacity, rate)
+        tuples, or from none of them. Returns 0 if allowed or the seconds to
+        wait until every bucket has enough tokens.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key, cost, capacity, rate in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels.append(_refill(tokens, updated, now, capacity, rate))
+            wait = _wait(buckets, levels)
+            for (key, cost, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens if wait else tokens - cost, now)
+            if len(self._buckets) > MAX_LOCAL_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Buckets idle this long have refilled at any sensible rate, so
+        # dropping them loses nothing
+        idle = [
+            key for key, (tokens, updated) in self._buckets.items()
+            if now - updated > 600
+        ]
+        for key in idle:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    def take(self, buckets):
+        now = time.time()
+        cache_keys = [f"throttle:{key}" for key, _, _, _ in buckets]
+        found = cache.get_many(cache_keys)
+        levels = []
+        for cache_key, (_, _, capacity, rate) in zip(cache_keys, buckets):
+            tokens, updated = found.get(cache_key, (capacity, now))
+            levels.append(_refill(tokens, updated, now, capacity, rate))
+        wait = _wait(buckets, levels)
+        for cache_key, (_, cost, capacity, rate), tokens in zip(cache_keys, buckets, levels):
+            if not wait:
+                tokens -= cost
+            # Expire once the bucket would have refilled anyway
+            cache.set(cache_key, (tokens, now), int((capacity - tokens) / rate) + 1)
+        return wait
+
+    def clear(self):
+        pass
+
+
+local_store = LocalBucketStore()
+cache_store = CacheBucketStore()
+
+
+def get_store():
+    return cache_store if _config('BACKEND', 'local') == 'cache' else local_store
+
+
+def endpoint_name(request, view):
+    """
+    The URL pattern and action a request is throttled under. Function based
+    views all share one view class, so the resolved view name tells them
+    apart.
+    """
+    match = getattr(request, 'resolver_match', None)
+    name = match.view_name if match else view.__class__.__name__
+    return f"{name}.{getattr(view, 'action', None) or request.method.lower()}"
+
+
+def request_cost(request, view):
+    costs = getattr(view, 'throttle_costs', {})
+    cost = costs.get(getattr(view, 'action', None), costs.get('default', 1))
+    page = request.query_params.get('page', '')
+    if page.isdigit():
+        cost *= 1 + (int(page) - 1) // _config('PAGE_COST_STEP', 10)
+    return cost
+
+
+class CostBasedThrottle(BaseThrottle):
+    """Token bucket throttle charging each request by its expected cost"""
+
+    def allow_request(self, request, view):
+        rates = dict(DEFAULT_RATES, **_config('RATES', {}))
+        if request.user and request.user.is_authenticated:
+            ident, client_scope = f"user:{request.user.pk}", 'user'
+        else:
+            ident, client_scope = f"anon:{self.get_ident(request)}", 'anon'
+
+        endpoint = endpoint_name(request, view)
+        endpoint_scope = getattr(view, 'throttle_scope', None) or 'endpoint'
+        cost = request_cost(request, view)
+
+        buckets = []
+        for key, scope in ((ident, client_scope), (f"{ident}:{endpoint}", endpoint_scope)):
+            capacity, rate = rates.get(scope, rates['endpoint'])
+            buckets.append((key, min(cost, capacity), capacity, rate))
+        # Either bucket can reject the request, and then neither is charged
+        self.wait_time = get_store().take(buckets)
+        if self.wait_time:
+            metrics.incr('throttle.rejected')
+            metrics.incr(f"throttle.rejected.{endpoint}")
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_time
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import batch_view, metrics_view
+
+urlpatterns = [
+    path('api/metrics/', metrics_view, name='metrics'),
+    path('api/batch/', batch_view, name='batch'),
+]
@@ -0,0 +1,24 @@
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from . import metrics
+from .batch import max_requests, run_batch
+from .response_cache import response_cache
+from .serializers import BatchSerializer
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    """Operational counters for this worker process (admin only)"""
+    return Response(dict(metrics.snapshot(), **response_cache.stats()))
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_view(request):
+    """Run several API requests in one round trip, see apps/core/batch.py"""
+    serializer = BatchSerializer(data=request.data, context={'max_requests': max_requests()})
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    responses = run_batch(request, request.user, request.auth, serializer.validated_data['requests'])
+    return Response({'responses': responses})
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class IngredientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.ingredients'
\ No newline at end of file
+    name = 'apps.ingredients'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
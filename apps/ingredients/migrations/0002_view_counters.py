@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingredients", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="trending_score",
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="view_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingredients", "0002_view_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="flags",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -5,6 +5,11 @@ class Ingredient(models.Model):
     default_unit = models.CharField(max_length=20, default='grams')
     category = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by apps.core.counters, updates lag reads by a few seconds
+    view_count = models.PositiveIntegerField(default=0, db_index=True)
+    trending_score = models.FloatField(default=0, db_index=True)
+    # Allergen and diet tags, see apps/ingredients/tags.py
+    flags = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['name']
@@ -1,8 +1,29 @@
 from rest_framework import serializers
 from .models import Ingredient
+from .tags import TAGS, to_flags, to_names
+
+class TagsField(serializers.Field):
+    """Tag flags as a list of tag names, see apps/ingredients/tags.py"""
+    default_error_messages = {
+        'not_a_list': 'Expected a list of tags.',
+        'invalid_tag': 'Unknown tag "{tag}", expected one of: {choices}.',
+    }
+    
+    def to_representation(self, value):
+        return to_names(value)
+    
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            self.fail('not_a_list')
+        for tag in data:
+            if tag not in TAGS:
+                self.fail('invalid_tag', tag=tag, choices=', '.join(TAGS))
+        return to_flags(data)
 
 class IngredientSerializer(serializers.ModelSerializer):
+    tags = TagsField(source='flags', required=False)
+    
     class Meta:
         model = Ingredient
-        fields = ['id', 'name', 'default_unit', 'category', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'name', 'default_unit', 'category', 'tags', 'view_count', 'created_at']
+        read_only_fields = ['id', 'view_count', 'created_at']
@@ -0,0 +1,8 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.cache import invalidate
+from .models import Ingredient
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_listings(sender, **kwargs):
+    invalidate('ingredients')
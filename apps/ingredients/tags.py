@@ -0,0 +1,91 @@
+"""
+Allergen and diet tags, stored as bit flags.
+
+An ingredient's ``flags`` say what it contains: one of the 14 allergens that
+must be declared in the EU, or something certain diets exclude. A recipe's
+``flags`` are the OR of its ingredients' flags, and a user's profile holds
+the flags they want to avoid, so "is this recipe safe" is a single
+``flags & excluded = 0`` test.
+
+Bit positions follow the order of ALLERGENS + DIET_TAGS and are stored in
+the database, so new tags go at the end of DIET_TAGS.
+"""
+import re
+
+ALLERGENS = [
+    'gluten', 'crustaceans', 'eggs', 'fish', 'peanuts', 'soy', 'milk',
+    'tree_nuts', 'celery', 'mustard', 'sesame', 'sulphites', 'lupin', 'molluscs',
+]
+DIET_TAGS = ['meat', 'pork', 'alcohol', 'animal_product']
+TAGS = {name: 1 << bit for bit, name in enumerate(ALLERGENS + DIET_TAGS)}
+
+
+def to_flags(names):
+    flags = 0
+    for name in names:
+        flags |= TAGS[name]
+    return flags
+
+
+def to_names(flags):
+    return [name for name, bit in TAGS.items() if flags & bit]
+
+
+# What a diet excludes, by the names people write in their profile
+_VEGETARIAN = ['meat', 'pork', 'fish', 'crustaceans', 'molluscs']
+DIETS = {
+    'vegetarian': _VEGETARIAN,
+    'vegan': _VEGETARIAN + ['eggs', 'milk', 'animal_product'],
+    'pescatarian': ['meat', 'pork'],
+    'halal': ['pork', 'alcohol'],
+    'kosher': ['pork', 'crustaceans', 'molluscs'],
+    'gluten free': ['gluten'],
+    'coeliac': ['gluten'],
+    'celiac': ['gluten'],
+    'dairy free': ['milk'],
+    'lactose free': ['milk'],
+    'nut free': ['peanuts', 'tree_nuts'],
+    'alcohol free': ['alcohol'],
+    'teetotal': ['alcohol'],
+}
+
+# Everyday words for allergens, besides the tag names themselves
+SYNONYMS = {
+    'wheat': ['gluten'],
+    'egg': ['eggs'],
+    'dairy': ['milk'],
+    'lactose': ['milk'],
+    'nuts': ['peanuts', 'tree_nuts'],
+    'nut': ['peanuts', 'tree_nuts'],
+    'peanut': ['peanuts'],
+    'tree nuts': ['tree_nuts'],
+    'tree nut': ['tree_nuts'],
+    'shellfish': ['crustaceans', 'molluscs'],
+    'soya': ['soy'],
+    'sulfites': ['sulphites'],
+    'sulphite': ['sulphites'],
+    'sulfite': ['sulphites'],
+    'mollusc': ['molluscs'],
+    'mollusks': ['molluscs'],
+}
+
+_SEPARATORS = re.compile(r'[,;/\n]|\band\b')
+
+
+def parse_exclusions(*texts):
+    """
+    Flags excluded by free text such as a profile's allergies ("nuts,
+    shellfish") and dietary preferences ("vegetarian; gluten-free").
+    Unrecognised terms are ignored.
+    """
+    flags = 0
+    for text in texts:
+        for term in _SEPARATORS.split((text or '').lower()):
+            term = ' '.join(term.replace('-', ' ').replace('_', ' ').split())
+            if term.endswith(' allergy'):
+                term = term[:-len(' allergy')]
+            names = DIETS.get(term) or SYNONYMS.get(term)
+            if names is None and term.replace(' ', '_') in TAGS:
+                names = [term.replace(' ', '_')]
+            flags |= to_flags(names or [])
+    return flags
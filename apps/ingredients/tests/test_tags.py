@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from apps.ingredients.tags import TAGS, parse_exclusions, to_flags, to_names
+from apps.users.models import UserProfile
+
+
+class TagTests(SimpleTestCase):
+    def test_flags_round_trip(self):
+        self.assertEqual(to_names(to_flags(['milk', 'gluten'])), ['gluten', 'milk'])
+        self.assertEqual(to_flags([]), 0)
+
+    def test_bit_positions_are_stable(self):
+        # Stored in the database, new tags must only ever be appended
+        self.assertEqual(TAGS['gluten'], 1)
+        self.assertEqual(TAGS['molluscs'], 1 << 13)
+        self.assertEqual(TAGS['animal_product'], 1 << 17)
+
+    def test_parse_allergies(self):
+        self.assertEqual(
+            to_names(parse_exclusions('Nuts, shellfish and soya')),
+            ['crustaceans', 'peanuts', 'soy', 'tree_nuts', 'molluscs'],
+        )
+        self.assertEqual(to_names(parse_exclusions('peanut allergy; tree_nuts')), ['peanuts', 'tree_nuts'])
+
+    def test_parse_diets(self):
+        self.assertEqual(to_names(parse_exclusions('', 'Gluten-free / halal')), ['gluten', 'pork', 'alcohol'])
+        self.assertEqual(
+            to_names(parse_exclusions('', 'vegan')),
+            ['crustaceans', 'eggs', 'fish', 'milk', 'molluscs', 'meat', 'pork', 'animal_product'],
+        )
+
+    def test_unrecognised_terms_are_ignored(self):
+        self.assertEqual(parse_exclusions('cilantro', None), 0)
+
+
+class ProfileExclusionTests(TestCase):
+    def test_profile_keeps_excluded_flags_up_to_date(self):
+        profile = UserProfile.objects.create(user=User.objects.create_user('cook'), allergies='dairy')
+        self.assertEqual(profile.excluded_flags, TAGS['milk'])
+        profile.dietary_preferences = 'vegetarian'
+        profile.save(update_fields=['dietary_preferences'])
+        profile.refresh_from_db()
+        self.assertEqual(to_names(profile.excluded_flags), ['crustaceans', 'fish', 'milk', 'molluscs', 'meat', 'pork'])
@@ -1,5 +1,7 @@
 from rest_framework import viewsets, permissions, filters
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.core.cache import cached_listing
+from apps.core.counters import view_counter
 from .models import Ingredient
 from .serializers import IngredientSerializer
 
@@ -10,6 +12,17 @@ class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name']
-    filterset_fields = ['category']
\ No newline at end of file
+    filterset_fields = ['category']
+    ordering_fields = ['name', 'view_count', 'trending_score']
+    throttle_costs = {'list': 2, 'default': 1}
+    
+    @cached_listing('ingredients')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        view_counter.incr(Ingredient, response.data['id'])
+        return response
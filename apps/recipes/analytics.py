@@ -0,0 +1,368 @@
+"""
+Columnar analytics snapshots of recipe data.
+
+Recipes and recipe ingredients are streamed out of the database in keyset
+chunks and written as Parquet files partitioned by recipe id range, with
+repeated strings (category, difficulty, ingredient, unit) stored as pandas
+categoricals. Only one partition is held in memory at a time, both while
+exporting and while computing the reports, so memory stays bounded however
+many rows there are.
+
+An incremental refresh re-exports only the partitions containing recipes
+updated since the last run (or recipes that gained ingredients, or whose
+category or an ingredient was renamed), and drops recipes that no longer exist
+from partitions whose recipe count changed. Changes that touch neither
+``Recipe.updated_at`` nor ``RecipeIngredient.created_at``, such as editing an
+ingredient's quantity, are picked up by the next full export.
+
+Layout::
+
+    <output>/state.json
+    <output>/categories.parquet
+    <output>/ingredients.parquet
+    <output>/recipes/part-000000.parquet
+    <output>/recipe_ingredients/part-000000.parquet
+    <output>/reports/*.csv
+"""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+from django.db.models import Count, F, Max
+
+from apps.categories.models import Category
+from apps.ingredients.models import Ingredient
+from .models import Recipe, RecipeIngredient
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_PARTITION_SIZE = 100000
+
+RECIPE_COLUMNS = [
+    'id', 'user_id', 'category_id', 'category', 'name', 'difficulty', 'prep_time',
+    'cook_time', 'servings', 'view_count', 'created_at', 'updated_at',
+]
+RECIPE_INGREDIENT_COLUMNS = [
+    'id', 'recipe_id', 'ingredient_id', 'ingredient', 'category', 'quantity', 'unit',
+]
+CATEGORICAL_COLUMNS = ['category', 'difficulty', 'ingredient', 'unit']
+
+
+def _frame(rows, columns):
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    if 'quantity' in df:
+        df['quantity'] = df['quantity'].astype('float64')
+    if 'prep_time' in df:
+        df['total_time'] = df['prep_time'] + df['cook_time']
+    return df
+
+
+def _recipe_rows(queryset, chunk_size):
+    """Yield lists of recipe rows in primary key order, one chunk at a time"""
+    last_id = 0
+    values = queryset.order_by('pk').values_list(
+        'id', 'user_id', 'category_id', 'category__name', 'name', 'difficulty', 'prep_time',
+        'cook_time', 'servings', 'view_count', 'created_at', 'updated_at',
+    )
+    while True:
+        rows = list(values.filter(pk__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def _recipe_ingredient_rows(queryset, chunk_size):
+    last_id = 0
+    values = queryset.order_by('pk').values_list(
+        'id', 'recipe_id', 'ingredient_id', 'ingredient__name', 'recipe__category__name', 'quantity', 'unit',
+    )
+    while True:
+        rows = list(values.filter(pk__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+class Snapshot:
+    def __init__(self, output, chunk_size=DEFAULT_CHUNK_SIZE, partition_size=DEFAULT_PARTITION_SIZE, log=None):
+        self.output = Path(output)
+        self.chunk_size = chunk_size
+        self.partition_size = partition_size
+        self.log = log or (lambda message: None)
+
+    @property
+    def state_path(self):
+        return self.output / 'state.json'
+
+    def read_state(self):
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def write_state(self, watermark, counts):
+        state = {
+            'version': FORMAT_VERSION,
+            'partition_size': self.partition_size,
+            'watermark': watermark.isoformat() if watermark else None,
+            # Recipes per partition, used to notice deletions
+            'counts': {str(partition): count for partition, count in counts.items()},
+        }
+        tmp = self.state_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def partition_path(self, table, partition):
+        return self.output / table / f"part-{partition:06d}.parquet"
+
+    def write_partition(self, table, partition, df):
+        path = self.partition_path(table, partition)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if df.empty:
+            if path.exists():
+                path.unlink()
+            return
+        tmp = path.with_suffix('.tmp')
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def export_partition(self, partition, recipe_ids=None, existing=None):
+        """
+        Export one partition and return its number of recipes. With
+        ``recipe_ids``, only those recipes are re-read and merged into the
+        ``existing`` partition frames.
+        """
+        low = partition * self.partition_size
+        high = low + self.partition_size
+        recipes = Recipe.objects.filter(pk__gte=low, pk__lt=high)
+        recipe_ingredients = RecipeIngredient.objects.filter(recipe_id__gte=low, recipe_id__lt=high)
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            recipe_ingredients = recipe_ingredients.filter(recipe_id__in=recipe_ids)
+
+        recipe_frames = [_frame(rows, RECIPE_COLUMNS) for rows in _recipe_rows(recipes, self.chunk_size)]
+        ingredient_frames = [
+            _frame(rows, RECIPE_INGREDIENT_COLUMNS)
+            for rows in _recipe_ingredient_rows(recipe_ingredients, self.chunk_size)
+        ]
+
+        if existing is not None:
+            old_recipes, old_ingredients = existing
+            # Drop stale copies of the refreshed recipes and rows of deleted ones
+            live_ids = set(Recipe.objects.filter(pk__gte=low, pk__lt=high).values_list('pk', flat=True))
+            keep = set(live_ids) - set(recipe_ids)
+            recipe_frames.insert(0, old_recipes[old_recipes['id'].isin(keep)])
+            ingredient_frames.insert(0, old_ingredients[old_ingredients['recipe_id'].isin(keep)])
+
+        for table, frames, columns in (
+            ('recipes', recipe_frames, RECIPE_COLUMNS),
+            ('recipe_ingredients', ingredient_frames, RECIPE_INGREDIENT_COLUMNS),
+        ):
+            frames = [frame for frame in frames if not frame.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else _frame([], columns)
+            for column in CATEGORICAL_COLUMNS:
+                if column in df:
+                    # Categories differ between chunks, so re-encode after concat
+                    df[column] = df[column].astype('object').astype('category')
+            self.write_partition(table, partition, df)
+            if table == 'recipes':
+                count = len(df)
+        return count
+
+    def read_partition(self, partition):
+        frames = []
+        for table, columns in (('recipes', RECIPE_COLUMNS), ('recipe_ingredients', RECIPE_INGREDIENT_COLUMNS)):
+            path = self.partition_path(table, partition)
+            frames.append(pd.read_parquet(path) if path.exists() else _frame([], columns))
+        return frames
+
+    def export_dimensions(self):
+        self.output.mkdir(parents=True, exist_ok=True)
+        categories = _frame(list(Category.objects.values_list('id', 'name')), ['id', 'name'])
+        categories.to_parquet(self.output / 'categories.parquet', index=False)
+
+        frames = []
+        for rows in self._ingredient_chunks():
+            frames.append(_frame(rows, ['id', 'name', 'category', 'default_unit', 'view_count']))
+        ingredients = pd.concat(frames, ignore_index=True) if frames else _frame([], ['id', 'name', 'category', 'default_unit', 'view_count'])
+        ingredients['category'] = ingredients['category'].astype('object').astype('category')
+        ingredients.to_parquet(self.output / 'ingredients.parquet', index=False)
+
+    def read_dimension_names(self):
+        """Category and ingredient names of the previous snapshot, keyed by id"""
+        names = []
+        for filename in ('categories.parquet', 'ingredients.parquet'):
+            path = self.output / filename
+            if not path.exists():
+                return None
+            df = pd.read_parquet(path, columns=['id', 'name'])
+            names.append(dict(zip(df['id'], df['name'])))
+        return names
+
+    def renamed_recipe_ids(self, previous_names):
+        """Recipes whose copied category or ingredient names are now out of date"""
+        old_categories, old_ingredients = previous_names
+        categories = [
+            pk for pk, name in Category.objects.values_list('pk', 'name')
+            if pk in old_categories and old_categories[pk] != name
+        ]
+        ingredients = [
+            pk for pk, name in Ingredient.objects.values_list('pk', 'name')
+            if pk in old_ingredients and old_ingredients[pk] != name
+        ]
+        recipe_ids = set()
+        if categories:
+            recipe_ids.update(Recipe.objects.filter(category_id__in=categories).values_list('pk', flat=True))
+        if ingredients:
+            recipe_ids.update(
+                RecipeIngredient.objects.filter(ingredient_id__in=ingredients).values_list('recipe_id', flat=True)
+            )
+        return recipe_ids
+
+    def _ingredient_chunks(self):
+        last_id = 0
+        values = Ingredient.objects.order_by('pk').values_list('id', 'name', 'category', 'default_unit', 'view_count')
+        while True:
+            rows = list(values.filter(pk__gt=last_id)[:self.chunk_size])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def export(self, full=False):
+        """Export a full or incremental snapshot, returns the number of partitions written"""
+        state = self.read_state()
+        if state and (state['version'] != FORMAT_VERSION or state['partition_size'] != self.partition_size):
+            self.log("Snapshot format or partition size changed, doing a full export")
+            full = True
+        if state is None or state['watermark'] is None:
+            full = True
+
+        # Take the watermark before reading so concurrent updates are
+        # picked up again by the next refresh rather than lost
+        watermarks = [
+            Recipe.objects.aggregate(latest=Max('updated_at'))['latest'],
+            RecipeIngredient.objects.aggregate(latest=Max('created_at'))['latest'],
+        ]
+        watermark = max((w for w in watermarks if w), default=None)
+        previous_names = None if full else self.read_dimension_names()
+        if previous_names is None:
+            full = True
+        else:
+            # Names are copied into the partitions, so renames must refresh them
+            renamed = self.renamed_recipe_ids(previous_names)
+        self.export_dimensions()
+
+        if full:
+            counts = self.export_full()
+            written = len(counts)
+        else:
+            previous = {int(partition): count for partition, count in state.get('counts', {}).items()}
+            counts, written = self.export_changes(
+                pd.Timestamp(state['watermark']).to_pydatetime(), previous, renamed
+            )
+
+        self.write_state(watermark, counts)
+        return written
+
+    def export_full(self):
+        last = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        partitions = range(last // self.partition_size + 1)
+        for table in ('recipes', 'recipe_ingredients'):
+            directory = self.output / table
+            if directory.exists():
+                for path in directory.glob('part-*.parquet'):
+                    path.unlink()
+        counts = {}
+        for partition in partitions:
+            counts[partition] = self.export_partition(partition)
+            self.log(f"Exported partition {partition + 1}/{len(partitions)}")
+        return counts
+
+    def live_counts(self):
+        """Number of recipes currently in each partition, in one query"""
+        rows = (
+            Recipe.objects.order_by()
+            .annotate(partition=F('pk') / self.partition_size)
+            .values('partition')
+            .annotate(count=Count('pk'))
+            .values_list('partition', 'count')
+        )
+        return dict(rows)
+
+    def export_changes(self, watermark, previous_counts, renamed=()):
+        """Refresh changed partitions, returns (recipe counts, partitions written)"""
+        changed = set(renamed)
+        changed.update(Recipe.objects.filter(updated_at__gt=watermark).values_list('pk', flat=True))
+        changed.update(
+            RecipeIngredient.objects.filter(created_at__gt=watermark).values_list('recipe_id', flat=True)
+        )
+        by_partition = {}
+        for recipe_id in changed:
+            by_partition.setdefault(recipe_id // self.partition_size, []).append(recipe_id)
+
+        # A partition with fewer recipes than in the snapshot had deletions
+        counts = self.live_counts()
+        for partition in set(counts) | set(previous_counts):
+            if counts.get(partition, 0) != previous_counts.get(partition, 0):
+                by_partition.setdefault(partition, [])
+
+        for partition, recipe_ids in sorted(by_partition.items()):
+            counts[partition] = self.export_partition(partition, recipe_ids, existing=self.read_partition(partition))
+            self.log(f"Refreshed {len(recipe_ids)} recipes in partition {partition}")
+        return {partition: count for partition, count in counts.items() if count}, len(by_partition)
+
+    def partitions(self):
+        return sorted(
+            int(path.stem.split('-')[1])
+            for path in (self.output / 'recipes').glob('part-*.parquet')
+        )
+
+    def build_reports(self, top=10):
+        """Aggregate the snapshot one partition at a time and write CSV reports"""
+        time_totals = None
+        ingredient_counts = None
+        for partition in self.partitions():
+            recipes, recipe_ingredients = self.read_partition(partition)
+            recipes['category'] = recipes['category'].astype('object').fillna('Uncategorized')
+            totals = recipes.groupby(['category', 'difficulty'], observed=True)['total_time'].agg(['sum', 'count'])
+            time_totals = totals if time_totals is None else time_totals.add(totals, fill_value=0)
+
+            recipe_ingredients['category'] = recipe_ingredients['category'].astype('object').fillna('Uncategorized')
+            counts = recipe_ingredients.groupby(['category', 'ingredient'], observed=True).size()
+            ingredient_counts = counts if ingredient_counts is None else ingredient_counts.add(counts, fill_value=0)
+
+        reports = self.output / 'reports'
+        reports.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        if time_totals is not None:
+            report = time_totals.rename(columns={'count': 'recipes'}).reset_index()
+            report['avg_total_time'] = (report['sum'] / report['recipes']).round(1)
+            report['recipes'] = report['recipes'].astype('int64')
+            report = report.drop(columns='sum').sort_values(['category', 'difficulty'])
+            report.to_csv(reports / 'avg_total_time_by_category_difficulty.csv', index=False)
+            written.append('avg_total_time_by_category_difficulty.csv')
+
+            by_difficulty = time_totals.groupby(level='difficulty', observed=True).sum()
+            report = (by_difficulty['sum'] / by_difficulty['count']).round(1).rename('avg_total_time').reset_index()
+            report.to_csv(reports / 'avg_total_time_by_difficulty.csv', index=False)
+            written.append('avg_total_time_by_difficulty.csv')
+
+        if ingredient_counts is not None and not ingredient_counts.empty:
+            report = ingredient_counts.rename('recipes').astype('int64').reset_index()
+            report = (
+                report.sort_values(['category', 'recipes', 'ingredient'], ascending=[True, False, True])
+                .groupby('category', observed=True).head(top)
+            )
+            report.to_csv(reports / 'top_ingredients_by_category.csv', index=False)
+            written.append('top_ingredients_by_category.csv')
+
+        return written
@@ -0,0 +1,45 @@
+"""
+Response cache keys for recipes, see apps/core/response_cache.py.
+
+Versions are bumped by the receivers in signals.py:
+
+- ``recipe:<id>`` when the recipe or its ingredients change;
+- ``recipes:user:<id>`` when any of the user's recipes or recipe
+  ingredients change, for list responses;
+- ``account:<id>`` when the user or their profile changes, since responses
+  include the username and listings leave out recipes the profile
+  excludes;
+- ``catalog`` when a category or ingredient changes, since responses include
+  their names and ingredient tags feed into recipe tags.
+"""
+import hashlib
+
+CATALOG_NAMESPACE = 'catalog'
+
+
+def recipe_namespace(recipe_id):
+    return f"recipe:{recipe_id}"
+
+
+def recipe_list_namespace(user_id):
+    return f"recipes:user:{user_id}"
+
+
+def account_namespace(user_id):
+    return f"account:{user_id}"
+
+
+def recipe_detail_key(view, request, *args, **kwargs):
+    # Responses are per user, the key only matches for the owner
+    # /api/recipes/05/ is recipe 5, whose namespace is recipe:5
+    recipe_id = int(kwargs[view.lookup_url_kwarg or view.lookup_field])
+    namespaces = [recipe_namespace(recipe_id), account_namespace(request.user.pk), CATALOG_NAMESPACE]
+    return namespaces, [request.user.pk, recipe_id]
+
+
+def recipe_list_key(view, request, *args, **kwargs):
+    # The host is part of the pagination links
+    path = hashlib.md5(f"{request.get_host()}{request.get_full_path()}".encode()).hexdigest()
+    user_id = request.user.pk
+    namespaces = [recipe_list_namespace(user_id), account_namespace(user_id), CATALOG_NAMESPACE]
+    return namespaces, [user_id, path]
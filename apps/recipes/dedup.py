@@ -0,0 +1,178 @@
+"""
+Near-duplicate recipe detection with MinHash and locality-sensitive hashing.
+
+Each recipe is reduced to a set of shingles (overlapping word triples from its
+instructions plus one token per ingredient) and summarised by a MinHash
+signature of NUM_PERM values. The fraction of equal values between two
+signatures estimates the Jaccard similarity of the shingle sets. Signatures
+are split into BANDS bands that are hashed into RecipeBucket rows, so
+candidate duplicates are found with an indexed lookup on (user, band, bucket)
+instead of comparing every pair of recipes.
+"""
+import functools
+import hashlib
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.5
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_random = np.random.RandomState(1)
+# Fixed permutations so signatures are comparable across processes and runs
+_A = _random.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _random.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def shingles(instructions, ingredient_ids):
+    words = _WORD_RE.findall(instructions.lower())
+    result = {
+        ' '.join(words[i:i + SHINGLE_SIZE])
+        for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))
+    } if words else set()
+    result.update(f"ingredient:{pk}" for pk in ingredient_ids)
+    return result
+
+
+def compute_signature(instructions, ingredient_ids):
+    """MinHash signature of a recipe as an array of NUM_PERM uint32 values"""
+    tokens = shingles(instructions, ingredient_ids)
+    if not tokens:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint32)
+    hashes = np.array([zlib.crc32(token.encode('utf-8')) for token in tokens], dtype=np.uint64)
+    # uint64 overflow in the multiplication is intended, as in the usual
+    # (a * x + b) mod p universal hash construction
+    with np.errstate(over='ignore'):
+        permuted = (np.outer(hashes, _A) + _B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_hashes(signature):
+    hashes = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        hashes.append(int.from_bytes(digest, 'big', signed=True))
+    return hashes
+
+
+def to_signature(data):
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def similarity(signature, other):
+    return float(np.mean(signature == other))
+
+
+def update_signature(recipe_id):
+    """Recompute the signature and LSH buckets of one recipe"""
+    from .models import Recipe, RecipeBucket, RecipeIngredient, RecipeSignature
+
+    row = Recipe.objects.filter(pk=recipe_id).values_list('user_id', 'instructions').first()
+    if row is None:
+        return None
+    user_id, instructions = row
+    ingredient_ids = RecipeIngredient.objects.filter(recipe_id=recipe_id).values_list('ingredient_id', flat=True)
+    signature = compute_signature(str(instructions), ingredient_ids)
+
+    with transaction.atomic():
+        RecipeSignature.objects.update_or_create(
+            recipe_id=recipe_id, defaults={'minhash': signature.tobytes()}
+        )
+        RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+        RecipeBucket.objects.bulk_create([
+            RecipeBucket(user_id=user_id, recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_hashes(signature))
+        ])
+    return signature
+
+
+_batches = threading.local()
+
+
+@contextmanager
+def batched_signature_updates():
+    """
+    Schedule each recipe's signature update once for the whole block.
+
+    Use inside ``transaction.atomic()`` around code that saves a recipe
+    together with its ingredients, which would otherwise schedule one update
+    per saved row. Nested blocks join the outermost one, and nothing is
+    scheduled if the block raises.
+    """
+    if getattr(_batches, 'recipe_ids', None) is not None:
+        yield
+        return
+    _batches.recipe_ids = recipe_ids = set()
+    try:
+        yield
+    finally:
+        _batches.recipe_ids = None
+    for recipe_id in sorted(recipe_ids):
+        transaction.on_commit(functools.partial(update_signature, recipe_id))
+
+
+def schedule_signature_update(recipe_id):
+    """Update a recipe's signature once the current transaction commits"""
+    recipe_ids = getattr(_batches, 'recipe_ids', None)
+    if recipe_ids is not None:
+        recipe_ids.add(recipe_id)
+    else:
+        transaction.on_commit(functools.partial(update_signature, recipe_id))
+
+
+def find_duplicates(recipe, threshold=DEFAULT_THRESHOLD):
+    """
+    Return (recipe_id, similarity) pairs for the owner's recipes that are
+    likely near-duplicates of ``recipe``, most similar first.
+    """
+    from .models import RecipeBucket, RecipeSignature
+
+    stored = RecipeSignature.objects.filter(recipe=recipe).values_list('minhash', flat=True).first()
+    signature = to_signature(stored) if stored is not None else update_signature(recipe.pk)
+
+    matches = Q()
+    for band, bucket in enumerate(band_hashes(signature)):
+        matches |= Q(band=band, bucket=bucket)
+    candidate_ids = set(
+        RecipeBucket.objects.filter(matches, user_id=recipe.user_id)
+        .exclude(recipe_id=recipe.pk)
+        .values_list('recipe_id', flat=True)
+    )
+    if not candidate_ids:
+        return []
+
+    results = []
+    for recipe_id, minhash in RecipeSignature.objects.filter(recipe_id__in=candidate_ids).values_list('recipe_id', 'minhash'):
+        score = similarity(signature, to_signature(minhash))
+        if score >= threshold:
+            results.append((recipe_id, score))
+    results.sort(key=lambda result: -result[1])
+    return results
+
+
+def signature_rows(rows):
+    """
+    Compute signatures for a chunk of (recipe_id, instructions, ingredient_ids)
+    rows, where instructions are zlib-compressed bytes or plain text. Runs in
+    worker processes during bulk scans, so it does not touch the database.
+    """
+    results = []
+    for recipe_id, instructions, ingredient_ids in rows:
+        if isinstance(instructions, bytes):
+            instructions = zlib.decompress(instructions).decode('utf-8')
+        signature = compute_signature(instructions, ingredient_ids)
+        results.append((recipe_id, signature.tobytes(), band_hashes(signature)))
+    return results
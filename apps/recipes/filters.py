@@ -0,0 +1,36 @@
+from django.db.models import F
+from rest_framework.filters import BaseFilterBackend
+
+SAFE_FOR_ME_PARAM = 'safe_for_me'
+OPT_OUT_VALUES = ('0', 'false', 'no')
+
+
+def excluded_flags(request):
+    """
+    Tag flags the requesting user's profile excludes (allergies and dietary
+    preferences), or 0 when they opted out with ``?safe_for_me=false``.
+    """
+    if request.query_params.get(SAFE_FOR_ME_PARAM, '').lower() in OPT_OUT_VALUES:
+        return 0
+    profile = getattr(request.user, 'profile', None)
+    return profile.excluded_flags if profile else 0
+
+
+def exclude_unsafe(queryset, excluded):
+    """
+    Leave out recipes with any ingredient tagged with ``excluded``. This is a
+    bitwise test on Recipe.flags, evaluated on the (user, flags) index
+    entries without joining the ingredients.
+    """
+    if not excluded:
+        return queryset
+    return queryset.alias(unsafe_flags=F('flags').bitand(excluded)).filter(unsafe_flags=0)
+
+
+class SafeForMeFilter(BaseFilterBackend):
+    """
+    Leaves out recipes that are unsafe for the user, unless the request
+    opts out with ``?safe_for_me=false``. Applied to every recipe listing.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return exclude_unsafe(queryset, excluded_flags(request))
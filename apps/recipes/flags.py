@@ -0,0 +1,54 @@
+"""
+Maintenance of Recipe.flags, the OR of a recipe's ingredient tag flags.
+
+Adding an ingredient only ever sets bits, so it is a single UPDATE that ORs
+the ingredient's flags in. Removing or replacing an ingredient, or clearing
+tags on an ingredient, may clear bits, so the affected recipes are
+recomputed from their remaining ingredients.
+
+Writes use queryset updates, which leave ``updated_at`` alone: a recipe's
+flags follow from its ingredients and are not an edit of the recipe.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Subquery
+
+from apps.ingredients.models import Ingredient
+from .models import Recipe, RecipeIngredient
+
+# Keeps IN (...) lists under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def add_ingredient_flags(recipe_id, ingredient_id):
+    flags = Ingredient.objects.filter(pk=ingredient_id).values('flags')
+    Recipe.objects.filter(pk=recipe_id).update(flags=F('flags').bitor(Subquery(flags)))
+
+
+def recompute_flags(recipe_ids):
+    """Recompute the flags of the given recipes from their ingredients"""
+    recipe_ids = sorted(set(recipe_ids))
+    flags = dict.fromkeys(recipe_ids, 0)
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids[start:start + CHUNK_SIZE]
+        ).values_list('recipe_id', 'ingredient__flags')
+        for recipe_id, ingredient_flags in rows:
+            flags[recipe_id] |= ingredient_flags
+
+    # One UPDATE per distinct value rather than per recipe
+    by_value = defaultdict(list)
+    for recipe_id, value in flags.items():
+        by_value[value].append(recipe_id)
+    for value, ids in by_value.items():
+        for start in range(0, len(ids), CHUNK_SIZE):
+            Recipe.objects.filter(pk__in=ids[start:start + CHUNK_SIZE]).update(flags=value)
+
+
+def ingredient_flags_changed(ingredient, old_flags):
+    recipes = RecipeIngredient.objects.filter(ingredient=ingredient).values('recipe_id')
+    if old_flags & ~ingredient.flags:
+        # Bits were cleared, other ingredients may still set them
+        recompute_flags(recipes.values_list('recipe_id', flat=True))
+    else:
+        Recipe.objects.filter(pk__in=Subquery(recipes)).update(flags=F('flags').bitor(ingredient.flags))
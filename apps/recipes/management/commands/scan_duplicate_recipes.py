@@ -0,0 +1,206 @@
+import csv
+import itertools
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.core.fields import CompressedValue
+from apps.recipes.dedup import DEFAULT_THRESHOLD, signature_rows, similarity, to_signature
+from apps.recipes.models import Recipe, RecipeBucket, RecipeIngredient, RecipeSignature
+
+# Buckets shared by more recipes than this, typically a recipe imported many
+# times over, are compared as a whole with vectorized signature comparisons
+# instead of expanding every pair into the candidate set
+MAX_BUCKET_SIZE = 100
+# Upper bound on the equality matrix built per step of a large bucket
+LARGE_BUCKET_CELLS = 2 ** 24
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the near-duplicate index (MinHash signatures and LSH buckets) "
+        "for all recipes in parallel, then report likely duplicate pairs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Recipes per work unit (default: %(default)s)')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Minimum estimated similarity to report (default: %(default)s)'
+        )
+        parser.add_argument('--output', default=None, help='Write duplicate pairs to this CSV file')
+        parser.add_argument('--report-only', action='store_true', help='Skip rebuilding the index')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options['report_only']:
+            self.rebuild(options['chunk_size'], options['workers'] or os.cpu_count() or 1)
+            self.stdout.write(f"Index rebuilt in {time.monotonic() - started:.1f}s")
+
+        pairs = self.find_pairs(options['threshold'])
+        groups = self.group(pairs)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['recipe_id', 'duplicate_id', 'similarity'])
+                writer.writerows((a, b, f"{score:.3f}") for a, b, score in pairs)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(pairs)} likely duplicate pairs in {len(groups)} groups "
+            f"({time.monotonic() - started:.1f}s)"
+        ))
+
+    def read_chunks(self, chunk_size):
+        last_id = 0
+        while True:
+            rows = list(
+                Recipe.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('id', 'user_id', 'instructions')[:chunk_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+
+            ingredients = defaultdict(list)
+            for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+                recipe_id__gte=rows[0][0], recipe_id__lte=last_id
+            ).values_list('recipe_id', 'ingredient_id'):
+                ingredients[recipe_id].append(ingredient_id)
+
+            # Ship compressed text to the workers, they decompress it
+            work = [
+                (recipe_id, instructions.data if isinstance(instructions, CompressedValue) else str(instructions), ingredients[recipe_id])
+                for recipe_id, _, instructions in rows
+            ]
+            yield work, {recipe_id: user_id for recipe_id, user_id, _ in rows}
+
+    def rebuild(self, chunk_size, workers):
+        RecipeBucket.objects.all().delete()
+        RecipeSignature.objects.all().delete()
+        total = Recipe.objects.count()
+        done = 0
+
+        def write(results, owners):
+            nonlocal done
+            with transaction.atomic():
+                RecipeSignature.objects.bulk_create([
+                    RecipeSignature(recipe_id=recipe_id, minhash=minhash)
+                    for recipe_id, minhash, _ in results
+                ])
+                RecipeBucket.objects.bulk_create([
+                    RecipeBucket(user_id=owners[recipe_id], recipe_id=recipe_id, band=band, bucket=bucket)
+                    for recipe_id, _, buckets in results
+                    for band, bucket in enumerate(buckets)
+                ], batch_size=5000)
+            done += len(results)
+            self.stdout.write(f"Indexed {done}/{total} recipes")
+
+        if workers == 1:
+            for work, owners in self.read_chunks(chunk_size):
+                write(signature_rows(work), owners)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            in_flight = deque()
+            for work, owners in self.read_chunks(chunk_size):
+                in_flight.append((executor.submit(signature_rows, work), owners))
+                if len(in_flight) >= workers * 2:
+                    future, owners = in_flight.popleft()
+                    write(future.result(), owners)
+            while in_flight:
+                future, owners = in_flight.popleft()
+                write(future.result(), owners)
+
+    def find_pairs(self, threshold):
+        candidates = set()
+        large_buckets = set()
+        buckets = (
+            RecipeBucket.objects.order_by('user_id', 'band', 'bucket')
+            .values_list('user_id', 'band', 'bucket', 'recipe_id')
+            .iterator(chunk_size=10000)
+        )
+        for _, rows in itertools.groupby(buckets, key=lambda row: row[:3]):
+            recipe_ids = tuple(sorted(row[3] for row in rows))
+            if len(recipe_ids) > MAX_BUCKET_SIZE:
+                # The same recipes usually share a bucket in every band
+                large_buckets.add(recipe_ids)
+            elif len(recipe_ids) > 1:
+                candidates.update(itertools.combinations(recipe_ids, 2))
+
+        pairs = {}
+        candidates = sorted(candidates)
+        for start in range(0, len(candidates), 5000):
+            batch = candidates[start:start + 5000]
+            signatures = self.load_signatures({recipe_id for pair in batch for recipe_id in pair})
+            for a, b in batch:
+                if a not in signatures or b not in signatures:
+                    continue
+                score = similarity(signatures[a], signatures[b])
+                if score >= threshold:
+                    pairs[(a, b)] = score
+
+        if large_buckets:
+            self.stdout.write(self.style.WARNING(
+                f"Comparing {len(large_buckets)} buckets of more than {MAX_BUCKET_SIZE} recipes pairwise "
+                f"(largest: {max(len(recipe_ids) for recipe_ids in large_buckets)} recipes)"
+            ))
+        for recipe_ids in large_buckets:
+            pairs.update(self.compare_bucket(recipe_ids, threshold))
+        return [(a, b, score) for (a, b), score in sorted(pairs.items())]
+
+    def load_signatures(self, recipe_ids):
+        signatures = {}
+        recipe_ids = sorted(recipe_ids)
+        for start in range(0, len(recipe_ids), 5000):
+            signatures.update(
+                (recipe_id, to_signature(minhash))
+                for recipe_id, minhash in RecipeSignature.objects.filter(
+                    recipe_id__in=recipe_ids[start:start + 5000]
+                ).values_list('recipe_id', 'minhash')
+            )
+        return signatures
+
+    def compare_bucket(self, recipe_ids, threshold):
+        """Similar pairs among the recipes of one large bucket, compared in row chunks"""
+        signatures = self.load_signatures(recipe_ids)
+        ids = np.array(sorted(signatures), dtype=np.int64)
+        if len(ids) < 2:
+            return {}
+        matrix = np.stack([signatures[recipe_id] for recipe_id in ids])
+        step = max(1, LARGE_BUCKET_CELLS // (len(ids) * matrix.shape[1]))
+        pairs = {}
+        for start in range(0, len(ids) - 1, step):
+            rows = matrix[start:start + step]
+            # Each row against itself and every later row
+            scores = (rows[:, None, :] == matrix[None, start:, :]).mean(axis=2)
+            rows_found, columns_found = np.nonzero(scores >= threshold)
+            # Column c is recipe start + c, so it comes after row r when c > r
+            later = columns_found > rows_found
+            for row, column in zip(rows_found[later], columns_found[later]):
+                pairs[(int(ids[start + row]), int(ids[start + column]))] = float(scores[row, column])
+        return pairs
+
+    def group(self, pairs):
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b, _ in pairs:
+            parent[find(a)] = find(b)
+
+        groups = defaultdict(list)
+        for recipe_id in parent:
+            groups[find(recipe_id)].append(recipe_id)
+        return list(groups.values())
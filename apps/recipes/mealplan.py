@@ -0,0 +1,177 @@
+"""
+Meal plan generation over a user's recipe library.
+
+Choosing N recipes out of thousands so that they share as many ingredients as
+possible is a set-cover style problem, so the planner does not search it
+exhaustively. The library is loaded once into NumPy arrays (recipe times and
+the recipe x ingredient incidence as flat index pairs) and the plan is built
+in two phases:
+
+1. Greedy: fill the days one slot at a time with the recipe that fits the
+   remaining time budget of the day, leaving enough of it for the quickest
+   recipes to fill the day's other slots, and scores best, where the score of a
+   recipe is its ingredients already on the shopping list minus a multiple
+   of the ones it would add. Ties, including the very first pick, go to recipes made of
+   ingredients common across the library, which are the easiest to share.
+2. Local improvement: repeatedly swap a chosen recipe for the unchosen one
+   with the best score against the rest of the plan while keeping its day
+   within budget, until no swap helps or the time budget runs out.
+
+Recipes without ingredients are never picked.
+
+Every candidate is scored at once with ``np.bincount`` over the incidence
+pairs, so one step costs O(recipe ingredient rows) regardless of the plan size.
+"""
+import time
+
+import numpy as np
+
+# Weight of an ingredient a recipe adds to the shopping list against one it
+# shares with the plan. Plans maximize reused minus weighted new ingredients,
+# at 1 they drift towards large recipes that reuse a lot but also add a lot.
+NEW_INGREDIENT_COST = 3
+# Seconds, leaves room for building the response within 200ms
+DEFAULT_TIME_BUDGET = 0.15
+MAX_RECIPES = 35
+MAX_DAYS = 14
+
+
+class MealPlan:
+    def __init__(self, days, ingredient_ids, complete):
+        # days: list of lists of recipe ids
+        self.days = days
+        self.ingredient_ids = ingredient_ids
+        self.complete = complete
+
+    @property
+    def recipe_ids(self):
+        return [recipe_id for day in self.days for recipe_id in day]
+
+
+def load_library(recipes):
+    """
+    Arrays describing ``recipes`` (a Recipe queryset): ids, total times, and
+    the (recipe index, ingredient index) pairs of the incidence matrix.
+    """
+    from .models import RecipeIngredient
+
+    rows = list(recipes.order_by('pk').values_list('pk', 'prep_time', 'cook_time'))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    times = np.array([row[1] + row[2] for row in rows], dtype=np.int64)
+
+    pairs = np.array(
+        list(
+            RecipeIngredient.objects.filter(recipe__in=recipes.order_by().values('pk'))
+            .values_list('recipe_id', 'ingredient_id')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    # Recipes created between the two queries are not in ``ids``
+    pairs = pairs[np.isin(pairs[:, 0], ids)]
+    pair_recipes = np.searchsorted(ids, pairs[:, 0])
+    ingredient_ids, pair_ingredients = np.unique(pairs[:, 1], return_inverse=True)
+    return ids, times, pair_recipes, pair_ingredients, ingredient_ids
+
+
+class Planner:
+    def __init__(self, times, pair_recipes, pair_ingredients, ingredient_count, deadline):
+        self.times = times
+        self.pair_recipes = pair_recipes
+        self.pair_ingredients = pair_ingredients
+        self.recipe_count = len(times)
+        self.deadline = deadline
+
+        self.sizes = sizes = np.bincount(pair_recipes, minlength=self.recipe_count)
+        frequency = np.bincount(pair_ingredients, minlength=ingredient_count)
+        # Mean share of the library using each of the recipe's ingredients,
+        # always < 1 so it only breaks ties between equal reuse counts
+        commonness = np.bincount(
+            pair_recipes, weights=(frequency[pair_ingredients] - 1) / max(self.recipe_count, 1),
+            minlength=self.recipe_count,
+        )
+        self.tiebreak = np.divide(commonness, sizes, out=np.zeros(self.recipe_count), where=sizes > 0)
+        self.coverage = np.zeros(ingredient_count, dtype=np.int64)
+        self.chosen = np.zeros(self.recipe_count, dtype=bool)
+
+    def scores(self):
+        """Score of adding each recipe to the current plan"""
+        shared = np.bincount(
+            self.pair_recipes, weights=self.coverage[self.pair_ingredients] > 0, minlength=self.recipe_count
+        )
+        return shared - NEW_INGREDIENT_COST * (self.sizes - shared)
+
+    def candidates(self, max_time):
+        feasible = ~self.chosen & (self.sizes > 0)
+        if max_time is not None:
+            feasible &= self.times <= max_time
+        return feasible
+
+    def choose(self, recipe, sign=1):
+        self.chosen[recipe] = sign > 0
+        np.add.at(self.coverage, self.pair_ingredients[self.pair_recipes == recipe], sign)
+
+    def fill(self, slots, max_daily_time):
+        plan = [[] for _ in slots]
+        for day, day_slots in zip(plan, slots):
+            for slot in range(day_slots):
+                remaining = max_daily_time - self.times[day].sum() if max_daily_time is not None else None
+                score = self.scores() + self.tiebreak
+                feasible = self.candidates(remaining)
+                if not feasible.any():
+                    break
+                if remaining is not None:
+                    # Keep time for the quickest recipes to fill the other slots
+                    reserve = np.sort(self.times[feasible])[:day_slots - slot - 1].sum()
+                    fits = feasible & (self.times <= remaining - reserve)
+                    if fits.any():
+                        feasible = fits
+                recipe = int(np.argmax(np.where(feasible, score, -np.inf)))
+                self.choose(recipe)
+                day.append(recipe)
+        return plan
+
+    def improve(self, plan, max_daily_time):
+        improved = True
+        while improved and time.monotonic() < self.deadline:
+            improved = False
+            for day in plan:
+                for slot, recipe in enumerate(day):
+                    if time.monotonic() >= self.deadline:
+                        return
+                    self.choose(recipe, -1)
+                    score = self.scores()
+                    current = score[recipe]
+                    remaining = max_daily_time - self.times[day].sum() + self.times[recipe] if max_daily_time is not None else None
+                    feasible = self.candidates(remaining)
+                    feasible[recipe] = False
+                    candidate = int(np.argmax(np.where(feasible, score + self.tiebreak, -np.inf)))
+                    if feasible[candidate] and score[candidate] > current:
+                        day[slot] = recipe = candidate
+                        improved = True
+                    self.choose(recipe)
+
+
+def plan_meals(recipes, count, days, max_daily_time=None, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Pick ``count`` recipes from ``recipes`` spread over ``days`` days so that
+    each day's total time stays within ``max_daily_time`` minutes, reusing
+    ingredients as much as possible. Returns a MealPlan; ``complete`` is
+    False if not enough recipes fit.
+    """
+    if count < 1 or days < 1 or (max_daily_time is not None and max_daily_time < 1):
+        raise ValueError('count, days and max_daily_time must be at least 1')
+    deadline = time.monotonic() + time_budget
+    ids, times, pair_recipes, pair_ingredients, ingredient_ids = load_library(recipes)
+    # Spread the recipes evenly, earlier days take the remainder
+    slots = [count // days + (day < count % days) for day in range(days)]
+
+    planner = Planner(times, pair_recipes, pair_ingredients, len(ingredient_ids), deadline)
+    plan = planner.fill(slots, max_daily_time)
+    planner.improve(plan, max_daily_time)
+
+    chosen = sum(len(day) for day in plan)
+    return MealPlan(
+        days=[[int(ids[recipe]) for recipe in day] for day in plan],
+        ingredient_ids=[int(pk) for pk in ingredient_ids[planner.coverage > 0]],
+        complete=chosen == count,
+    )
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:04
+
+import apps.core.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def compress_instructions(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    db_alias = schema_editor.connection.alias
+    recipes = Recipe.objects.using(db_alias).only("id", "instructions")
+    batch = []
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        recipe.instructions_compressed = recipe.instructions
+        batch.append(recipe)
+        if len(batch) >= BATCH_SIZE:
+            Recipe.objects.using(db_alias).bulk_update(batch, ["instructions_compressed"])
+            batch = []
+    if batch:
+        Recipe.objects.using(db_alias).bulk_update(batch, ["instructions_compressed"])
+
+
+def decompress_instructions(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    db_alias = schema_editor.connection.alias
+    recipes = Recipe.objects.using(db_alias).only("id", "instructions_compressed")
+    batch = []
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        recipe.instructions = recipe.instructions_compressed
+        batch.append(recipe)
+        if len(batch) >= BATCH_SIZE:
+            Recipe.objects.using(db_alias).bulk_update(batch, ["instructions"])
+            batch = []
+    if batch:
+        Recipe.objects.using(db_alias).bulk_update(batch, ["instructions"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="instructions_compressed",
+            field=apps.core.fields.CompressedTextField(null=True),
+        ),
+        migrations.RunPython(compress_instructions, decompress_instructions),
+        # Gives the column a default so that it can be re-added on reversal
+        migrations.AlterField(
+            model_name="recipe",
+            name="instructions",
+            field=models.TextField(default=""),
+        ),
+        migrations.RemoveField(
+            model_name="recipe",
+            name="instructions",
+        ),
+        migrations.RenameField(
+            model_name="recipe",
+            old_name="instructions_compressed",
+            new_name="instructions",
+        ),
+        migrations.AlterField(
+            model_name="recipe",
+            name="instructions",
+            field=apps.core.fields.CompressedTextField(),
+        ),
+    ]
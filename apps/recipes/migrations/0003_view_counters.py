@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_compress_recipe_instructions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="trending_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="view_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "view_count"], name="recipes_rec_user_id_213b0f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "trending_score"], name="recipes_rec_user_id_ff0c5e_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_recipe_flags"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "created_at"], name="recipes_rec_user_id_5244dd_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "prep_time"], name="recipes_rec_user_id_55bea5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "cook_time"], name="recipes_rec_user_id_544873_idx"
+            ),
+        ),
+    ]
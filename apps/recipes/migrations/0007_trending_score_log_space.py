@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-19 18:40
+
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Log, Power
+
+
+def to_log_space(apps, schema_editor):
+    Model = apps.get_model("recipes", "recipe")
+    db_alias = schema_editor.connection.alias
+    Model.objects.using(db_alias).filter(trending_score__gt=0).update(
+        trending_score=Log(2, F("trending_score"))
+    )
+
+
+def from_log_space(apps, schema_editor):
+    Model = apps.get_model("recipes", "recipe")
+    db_alias = schema_editor.connection.alias
+    Model.objects.using(db_alias).filter(trending_score__gt=0).update(
+        trending_score=Power(2, F("trending_score"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_recipe_ordering_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log_space, from_log_space),
+    ]
@@ -2,6 +2,12 @@ from django.db import models
 from django.contrib.auth.models import User
 from apps.categories.models import Category
 from apps.ingredients.models import Ingredient
+from apps.core.fields import CompressedTextField
+
+class RecipeQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Recipes for list responses, without the large instructions column"""
+        return self.select_related('user', 'category').defer('instructions')
 
 class Recipe(models.Model):
     DIFFICULTY_CHOICES = [
@@ -14,17 +20,33 @@ class Recipe(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='recipes')
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    instructions = models.TextField()
+    instructions = CompressedTextField()
     prep_time = models.PositiveIntegerField(help_text="Preparation time in minutes")
     cook_time = models.PositiveIntegerField(help_text="Cooking time in minutes")
     servings = models.PositiveSmallIntegerField(default=1)
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by apps.core.counters, updates lag reads by a few seconds
+    view_count = models.PositiveIntegerField(default=0)
+    trending_score = models.FloatField(default=0)
+    # OR of the ingredients' tag flags, maintained by apps/recipes/flags.py
+    flags = models.PositiveIntegerField(default=0)
+    
+    objects = RecipeQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'name']
+        indexes = [
+            models.Index(fields=['user', 'view_count']),
+            models.Index(fields=['user', 'trending_score']),
+            models.Index(fields=['user', 'flags']),
+            # Listing orderings, see RecipeViewSet.ordering_fields
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['user', 'prep_time']),
+            models.Index(fields=['user', 'cook_time']),
+        ]
     
     def __str__(self):
         return f"{self.name} by {self.user.username}"
@@ -45,4 +67,23 @@ class RecipeIngredient(models.Model):
         unique_together = ['recipe', 'ingredient']
     
     def __str__(self):
-        return f"{self.quantity} {self.unit} {self.ingredient.name} for {self.recipe.name}"
\ No newline at end of file
+        return f"{self.quantity} {self.unit} {self.ingredient.name} for {self.recipe.name}"
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe, see apps/recipes/dedup.py"""
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+class RecipeBucket(models.Model):
+    """LSH band hash of a recipe signature, used to find duplicate candidates"""
+    # Denormalized from recipe so lookups stay within one user's recipes
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='lsh_buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'band', 'bucket']),
+        ]
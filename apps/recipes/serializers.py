@@ -1,7 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
+from .dedup import batched_signature_updates
 from .models import Recipe, RecipeIngredient
 from apps.categories.serializers import CategorySerializer
-from apps.ingredients.serializers import IngredientSerializer
+from apps.ingredients.serializers import IngredientSerializer, TagsField
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
@@ -21,15 +23,20 @@ class RecipeSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     recipe_ingredients = RecipeIngredientSerializer(many=True, read_only=True)
     total_time = serializers.ReadOnlyField()
+    tags = TagsField(source='flags', read_only=True)
     
     class Meta:
         model = Recipe
         fields = [
             'id', 'user', 'category', 'category_name', 'name', 'description', 
             'instructions', 'prep_time', 'cook_time', 'total_time', 'servings', 
-            'difficulty', 'created_at', 'updated_at', 'recipe_ingredients'
+            'difficulty', 'tags', 'view_count', 'created_at', 'updated_at', 'recipe_ingredients'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'view_count', 'created_at', 'updated_at']
+    
+    def update(self, instance, validated_data):
+        with transaction.atomic(), batched_signature_updates():
+            return super().update(instance, validated_data)
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientCreateSerializer(many=True, write_only=True)
@@ -43,10 +50,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        
-        for ingredient_data in ingredients_data:
-            RecipeIngredient.objects.create(recipe=recipe, **ingredient_data)
+        # One transaction, with the recipe's signature computed once for all rows
+        with transaction.atomic(), batched_signature_updates():
+            recipe = Recipe.objects.create(**validated_data)
+            
+            for ingredient_data in ingredients_data:
+                RecipeIngredient.objects.create(recipe=recipe, **ingredient_data)
         
         return recipe
 
@@ -55,13 +64,14 @@ class RecipeListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     total_time = serializers.ReadOnlyField()
     ingredient_count = serializers.SerializerMethodField()
+    tags = TagsField(source='flags', read_only=True)
     
     class Meta:
         model = Recipe
         fields = [
             'id', 'user', 'category_name', 'name', 'description', 
             'prep_time', 'cook_time', 'total_time', 'servings', 
-            'difficulty', 'created_at', 'ingredient_count'
+            'difficulty', 'tags', 'view_count', 'created_at', 'ingredient_count'
         ]
     
     def get_ingredient_count(self, obj):
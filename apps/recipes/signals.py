@@ -0,0 +1,127 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from apps.categories.models import Category
+from apps.core.cache import invalidate
+from apps.core.pubsub import broker
+from apps.ingredients.models import Ingredient
+from apps.users.models import UserProfile
+from .caching import CATALOG_NAMESPACE, account_namespace, recipe_list_namespace, recipe_namespace
+from .dedup import schedule_signature_update
+from .flags import add_ingredient_flags, ingredient_flags_changed, recompute_flags
+from .models import Recipe, RecipeIngredient
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_category_listings(sender, **kwargs):
+    # Category listings include recipe fields and ingredient counts
+    invalidate('category-recipes')
+
+def recipe_owner_id(recipe_ingredient):
+    if RecipeIngredient.recipe.is_cached(recipe_ingredient):
+        return recipe_ingredient.recipe.user_id
+    return Recipe.objects.filter(pk=recipe_ingredient.recipe_id).values_list('user_id', flat=True).first()
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_responses(sender, instance, **kwargs):
+    invalidate(recipe_namespace(instance.pk))
+    invalidate(recipe_list_namespace(instance.user_id))
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_ingredient_responses(sender, instance, **kwargs):
+    invalidate(recipe_namespace(instance.recipe_id))
+    user_id = recipe_owner_id(instance)
+    if user_id is not None:
+        invalidate(recipe_list_namespace(user_id))
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_catalog_responses(sender, **kwargs):
+    invalidate(CATALOG_NAMESPACE)
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_responses(sender, instance, **kwargs):
+    invalidate(account_namespace(instance.pk))
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_responses(sender, instance, **kwargs):
+    invalidate(account_namespace(instance.user_id))
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_signature(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_signature_update(instance.pk)
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def update_recipe_ingredient_signature(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_signature_update(instance.recipe_id)
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_recipe_flags(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        add_ingredient_flags(instance.recipe_id, instance.ingredient_id)
+    else:
+        # The ingredient may have been swapped for another
+        recompute_flags([instance.recipe_id])
+
+@receiver(post_delete, sender=RecipeIngredient)
+def clear_recipe_flags(sender, instance, **kwargs):
+    recompute_flags([instance.recipe_id])
+
+@receiver(pre_save, sender=Ingredient)
+def remember_ingredient_flags(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._previous_flags = Ingredient.objects.filter(pk=instance.pk).values_list('flags', flat=True).first()
+
+@receiver(post_save, sender=Ingredient)
+def propagate_ingredient_flags(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_flags', None)
+    if raw or created or previous is None or previous == instance.flags:
+        return
+    ingredient_flags_changed(instance, previous)
+    # Recipe flags were updated in bulk, without Recipe signals, and the
+    # shared category listings are filtered by their cached tags
+    invalidate('category-recipes')
+
+def user_channel(user_id):
+    return f"recipes:user:{user_id}"
+
+def publish_change(user_id, type, data):
+    # Only tell subscribers about changes that were actually committed
+    transaction.on_commit(lambda: broker.publish(user_channel(user_id), type, data))
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        publish_change(instance.user_id, 'recipe.created' if created else 'recipe.updated', {
+            'id': instance.pk,
+            'name': instance.name,
+            'updated_at': instance.updated_at.isoformat(),
+        })
+
+@receiver(post_delete, sender=Recipe)
+def publish_recipe_deleted(sender, instance, **kwargs):
+    publish_change(instance.user_id, 'recipe.deleted', {'id': instance.pk})
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def publish_recipe_ingredient_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_id = recipe_owner_id(instance)
+    if user_id is None:
+        return
+    if 'created' not in kwargs:
+        type = 'recipe_ingredient.deleted'
+    elif kwargs['created']:
+        type = 'recipe_ingredient.created'
+    else:
+        type = 'recipe_ingredient.updated'
+    publish_change(user_id, type, {
+        'id': instance.pk,
+        'recipe': instance.recipe_id,
+        'ingredient': instance.ingredient_id,
+    })
@@ -0,0 +1,164 @@
+"""
+Server-Sent Events feed of the authenticated user's recipe changes.
+
+This is a plain ASGI application mounted in recipe_project/asgi.py rather
+than a Django view: an idle connection is just a coroutine waiting on a
+queue, with no thread, middleware stack or database connection held, so a
+worker can keep thousands of them open. It requires an ASGI server such as
+uvicorn or daphne.
+
+Clients authenticate with an ``Authorization: Token <key>`` header or, since
+browsers' EventSource cannot set headers, a ``?ticket=`` query parameter. A
+ticket is a signed user id from ``POST /api/events/recipes/ticket/`` that
+expires after TICKET_MAX_AGE seconds, so URLs ending up in logs or browser
+history do not leak the long-lived API token. Each process caps how many
+streams it holds open, in total and per user (``LOAD_SHEDDING``). Reconnecting with ``Last-Event-ID`` replays the events missed meanwhile; if
+that is no longer possible a ``reset`` event tells the client to reload.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+
+from apps.core import metrics
+from apps.core.pubsub import broker
+from .signals import user_channel
+
+EVENTS_PATH = '/api/events/recipes/'
+HEARTBEAT_INTERVAL = 15
+RETRY_MS = 3000
+TICKET_MAX_AGE = 60
+TICKET_SALT = 'apps.recipes.streams.ticket'
+
+# Open streams per user id, only touched from the event loop
+open_streams = {}
+
+
+def _config(name, default):
+    return getattr(settings, 'LOAD_SHEDDING', {}).get(name, default)
+
+
+def issue_ticket(user):
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+@sync_to_async
+def authenticate(key=None, ticket=None):
+    close_old_connections()
+    try:
+        if key:
+            user = Token.objects.select_related('user').get(key=key).user
+        else:
+            user = User.objects.get(pk=signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_MAX_AGE))
+    except (Token.DoesNotExist, User.DoesNotExist, signing.BadSignature):
+        return None
+    finally:
+        close_old_connections()
+    return user if user.is_active else None
+
+
+def format_event(event):
+    lines = []
+    if event.id:
+        lines.append(f"id: {event.id}")
+    lines.append(f"event: {event.type}")
+    lines.append(f"data: {json.dumps(event.data)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def send_error(send, status, message, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+
+async def stream(send, subscription):
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.get(), HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            # Comment line keeps proxies from closing an idle connection
+            await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+            continue
+        if event is None:
+            return
+        await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def recipe_events(scope, receive, send):
+    if scope['method'] != 'GET':
+        await send_error(send, 405, 'Method not allowed')
+        return
+
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    user = None
+    auth = headers.get(b'authorization', b'').decode().split()
+    if len(auth) == 2 and auth[0].lower() == 'token':
+        user = await authenticate(key=auth[1])
+    elif query.get('ticket'):
+        user = await authenticate(ticket=query['ticket'][0])
+    if user is None:
+        await send_error(send, 401, 'Authentication credentials were not provided or are invalid')
+        return
+
+    retry_after = [(b'retry-after', str(_config('RETRY_AFTER', 1)).encode())]
+    if sum(open_streams.values()) >= _config('MAX_STREAMS', 1000):
+        metrics.incr('events.shed')
+        await send_error(send, 503, 'Server is busy, try again shortly', retry_after)
+        return
+    if open_streams.get(user.pk, 0) >= _config('MAX_STREAMS_PER_CLIENT', 4):
+        metrics.incr('events.rejected')
+        await send_error(send, 429, 'Too many open event streams', retry_after)
+        return
+    open_streams[user.pk] = open_streams.get(user.pk, 0) + 1
+    try:
+        await serve(user, headers, query, receive, send)
+    finally:
+        open_streams[user.pk] -= 1
+        if not open_streams[user.pk]:
+            del open_streams[user.pk]
+
+
+async def serve(user, headers, query, receive, send):
+    last_event_id = headers.get(b'last-event-id', b'').decode() or query.get('last_event_id', [None])[0]
+    subscription = broker.subscribe(user_channel(user.pk), last_event_id)
+    metrics.incr('events.connections')
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': f"retry: {RETRY_MS}\n\n".encode(), 'more_body': True})
+
+    streaming = asyncio.ensure_future(stream(send, subscription))
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([streaming, disconnect], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        streaming.cancel()
+        disconnect.cancel()
+
+    if streaming.done() and not streaming.cancelled() and streaming.exception() is None:
+        # The subscription overflowed, end the response so the client reconnects
+        await send({'type': 'http.response.body', 'body': b''})
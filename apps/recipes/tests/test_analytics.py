@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from apps.categories.models import Category
+from apps.ingredients.models import Ingredient
+from apps.recipes.analytics import Snapshot
+from apps.recipes.models import Recipe, RecipeIngredient
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.user = User.objects.create_user('cook', password='password123')
+        self.breakfast = Category.objects.create(name='Breakfast')
+        self.dinner = Category.objects.create(name='Dinner')
+        self.flour = Ingredient.objects.create(name='Flour', category='baking', default_unit='g')
+        self.egg = Ingredient.objects.create(name='Egg', category='dairy', default_unit='pcs')
+        self.rice = Ingredient.objects.create(name='Rice', category='grains', default_unit='g')
+        self.pancakes = self.recipe('Pancakes', self.breakfast, 'easy', 10, 20, [self.flour, self.egg])
+        self.omelette = self.recipe('Omelette', self.breakfast, 'easy', 5, 5, [self.egg])
+        self.risotto = self.recipe('Risotto', self.dinner, 'hard', 15, 45, [self.rice])
+        self.snapshot = Snapshot(self.output, chunk_size=2, partition_size=2)
+
+    def recipe(self, name, category, difficulty, prep_time, cook_time, ingredients):
+        recipe = Recipe.objects.create(
+            user=self.user, category=category, name=name, instructions='Cook it.',
+            difficulty=difficulty, prep_time=prep_time, cook_time=cook_time,
+        )
+        for ingredient in ingredients:
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity='2.50', unit='g')
+        return recipe
+
+    def partition(self, recipe):
+        return recipe.pk // self.snapshot.partition_size
+
+    def recipes(self):
+        return pd.concat(
+            [self.snapshot.read_partition(partition)[0] for partition in self.snapshot.partitions()],
+            ignore_index=True,
+        ).set_index('name')
+
+    def recipe_ingredients(self):
+        return pd.concat(
+            [self.snapshot.read_partition(partition)[1] for partition in self.snapshot.partitions()],
+            ignore_index=True,
+        )
+
+    def report(self, name):
+        return pd.read_csv(self.snapshot.output / 'reports' / name)
+
+    def test_full_export(self):
+        self.snapshot.export(full=True)
+
+        expected = sorted({self.partition(r) for r in (self.pancakes, self.omelette, self.risotto)})
+        self.assertEqual(self.snapshot.partitions(), expected)
+        for partition in expected:
+            self.assertTrue(self.snapshot.partition_path('recipe_ingredients', partition).exists())
+        self.assertTrue((self.snapshot.output / 'categories.parquet').exists())
+        self.assertTrue((self.snapshot.output / 'ingredients.parquet').exists())
+
+        recipes, recipe_ingredients = self.snapshot.read_partition(self.partition(self.risotto))
+        self.assertIn(self.risotto.pk, set(recipes['id']))
+        for column in ('category', 'difficulty'):
+            self.assertIsInstance(recipes[column].dtype, pd.CategoricalDtype)
+        for column in ('ingredient', 'category', 'unit'):
+            self.assertIsInstance(recipe_ingredients[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(recipe_ingredients['quantity'].dtype, 'float64')
+
+        recipes = self.recipes()
+        self.assertEqual(len(recipes), 3)
+        self.assertEqual(recipes.loc['Risotto', 'total_time'], 60)
+        self.assertEqual(recipes.loc['Pancakes', 'category'], 'Breakfast')
+        self.assertEqual(len(self.recipe_ingredients()), 4)
+
+    def test_incremental_refresh(self):
+        self.snapshot.export(full=True)
+        refreshed = {self.partition(r) for r in (self.pancakes, self.omelette, self.risotto)}
+        omelette_id = self.omelette.pk
+        self.pancakes.name = 'Crepes'
+        self.pancakes.save()
+        self.omelette.delete()
+        RecipeIngredient.objects.create(recipe=self.risotto, ingredient=self.egg, quantity=1, unit='pcs')
+
+        self.assertEqual(self.snapshot.export(), len(refreshed))
+
+        recipes = self.recipes()
+        self.assertEqual(sorted(recipes.index), ['Crepes', 'Risotto'])
+        recipe_ingredients = self.recipe_ingredients()
+        self.assertNotIn(omelette_id, set(recipe_ingredients['recipe_id']))
+        self.assertEqual(
+            sorted(recipe_ingredients[recipe_ingredients['recipe_id'] == self.risotto.pk]['ingredient']),
+            ['Egg', 'Rice'],
+        )
+
+    def test_incremental_refresh_without_changes_writes_nothing(self):
+        self.snapshot.export(full=True)
+        self.assertEqual(self.snapshot.export(), 0)
+
+    def test_incremental_refresh_picks_up_renames(self):
+        self.snapshot.export(full=True)
+        self.dinner.name = 'Supper'
+        self.dinner.save()
+        self.egg.name = 'Hen egg'
+        self.egg.save()
+
+        self.snapshot.export()
+
+        recipes = self.recipes()
+        self.assertEqual(recipes.loc['Risotto', 'category'], 'Supper')
+        self.assertEqual(recipes.loc['Pancakes', 'category'], 'Breakfast')
+        recipe_ingredients = self.recipe_ingredients()
+        self.assertEqual(
+            sorted(recipe_ingredients[recipe_ingredients['recipe_id'] == self.omelette.pk]['ingredient']),
+            ['Hen egg'],
+        )
+        self.assertNotIn('Egg', set(recipe_ingredients['ingredient']))
+
+    def test_reports(self):
+        self.snapshot.export(full=True)
+
+        self.assertEqual(sorted(self.snapshot.build_reports(top=1)), [
+            'avg_total_time_by_category_difficulty.csv',
+            'avg_total_time_by_difficulty.csv',
+            'top_ingredients_by_category.csv',
+        ])
+
+        report = self.report('avg_total_time_by_category_difficulty.csv')
+        self.assertEqual(report.to_dict('records'), [
+            {'category': 'Breakfast', 'difficulty': 'easy', 'recipes': 2, 'avg_total_time': 20.0},
+            {'category': 'Dinner', 'difficulty': 'hard', 'recipes': 1, 'avg_total_time': 60.0},
+        ])
+
+        report = self.report('avg_total_time_by_difficulty.csv')
+        self.assertEqual(report.to_dict('records'), [
+            {'difficulty': 'easy', 'avg_total_time': 20.0},
+            {'difficulty': 'hard', 'avg_total_time': 60.0},
+        ])
+
+        # Egg is in both breakfast recipes, flour in one
+        report = self.report('top_ingredients_by_category.csv')
+        self.assertEqual(report.to_dict('records'), [
+            {'category': 'Breakfast', 'ingredient': 'Egg', 'recipes': 2},
+            {'category': 'Dinner', 'ingredient': 'Rice', 'recipes': 1},
+        ])
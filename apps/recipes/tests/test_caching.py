@@ -0,0 +1,65 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache.backends.filebased import FileBasedCache
+from rest_framework.authtoken.models import Token
+
+from apps.core.test_runner import TestCase
+from apps.recipes.models import Recipe
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.recipe = Recipe.objects.create(
+            user=cls.user, name='Bread', description='Loaf', instructions='Knead and bake.', prep_time=20, cook_time=40,
+        )
+
+    def get(self, path):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def rename(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', {'name': name}, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_edit_changes_next_cached_response(self):
+        for path in [f'/api/recipes/{self.recipe.pk}/', '/api/recipes/', '/api/recipes/my_recipes/']:
+            with self.subTest(path=path):
+                self.get(path)
+                self.assertEqual(self.get(path)['X-Cache'], 'HIT')
+                self.rename(f'Bread {path}')
+                response = self.get(path)
+                self.assertFalse(response.has_header('X-Cache'))
+                self.assertIn(f'Bread {path}', response.content.decode())
+
+    def test_edit_changes_cached_response_for_padded_id(self):
+        path = f'/api/recipes/0{self.recipe.pk}/'
+        self.get(path)
+        self.assertEqual(self.get(path)['X-Cache'], 'HIT')
+        self.rename('Sourdough')
+        response = self.get(path)
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertEqual(response.data['name'], 'Sourdough')
+
+    def test_edit_in_another_process_changes_next_cached_response(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name}
+        path = f'/api/recipes/{self.recipe.pk}/'
+        with self.settings(CACHES={'default': shared}):
+            self.get(path)
+            self.assertEqual(self.get(path)['X-Cache'], 'HIT')
+            # Another worker process makes the edit, bumping versions through
+            # its own connection to the shared cache
+            with mock.patch('apps.core.cache.cache', FileBasedCache(directory.name, {})):
+                self.rename('Sourdough')
+            response = self.get(path)
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertEqual(response.json()['name'], 'Sourdough')
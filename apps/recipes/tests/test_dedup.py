@@ -0,0 +1,129 @@
+import csv
+import os
+import random
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from apps.core.test_runner import TestCase
+from apps.ingredients.models import Ingredient
+from apps.recipes.dedup import (
+    batched_signature_updates, compute_signature, find_duplicates, similarity,
+)
+from apps.recipes.models import Recipe, RecipeSignature
+
+WORDS = 'chop the onions and garlic then fry gently in butter until soft add stock simmer season serve'.split()
+
+
+def instructions(seed, length=120):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def edited(text):
+    # A light edit, as when a recipe is re-imported with a typo fixed
+    words = text.split()
+    words[10] = 'carefully'
+    return ' '.join(words)
+
+
+class SignatureTests(TestCase):
+    def test_identical_recipes_match(self):
+        text = instructions(1)
+        self.assertEqual(similarity(compute_signature(text, [1, 2]), compute_signature(text, [1, 2])), 1.0)
+
+    def test_near_duplicates_are_similar(self):
+        text = instructions(1)
+        score = similarity(compute_signature(text, [1, 2]), compute_signature(edited(text), [1, 2]))
+        self.assertGreater(score, 0.7)
+
+    def test_unrelated_recipes_are_not_similar(self):
+        score = similarity(compute_signature(instructions(1), [1, 2]), compute_signature(instructions(2), [3, 4]))
+        self.assertLess(score, 0.3)
+
+
+class FindDuplicatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.other = User.objects.create_user('other', password='password123')
+        text = instructions(1)
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.original = Recipe.objects.create(user=cls.user, name='Soup', description='', instructions=text, prep_time=5, cook_time=30)
+            cls.copy = Recipe.objects.create(user=cls.user, name='Soup (2)', description='', instructions=edited(text), prep_time=5, cook_time=30)
+            Recipe.objects.create(user=cls.user, name='Stew', description='', instructions=instructions(2), prep_time=5, cook_time=30)
+            Recipe.objects.create(user=cls.other, name='Soup', description='', instructions=text, prep_time=5, cook_time=30)
+
+    def test_finds_the_owners_near_duplicates_only(self):
+        matches = find_duplicates(self.original)
+        self.assertEqual([recipe_id for recipe_id, _ in matches], [self.copy.pk])
+
+
+class SignatureSchedulingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredients = Ingredient.objects.bulk_create([Ingredient(name=f'ingredient {i}') for i in range(8)])
+
+    def test_one_signature_write_per_create(self):
+        data = {
+            'name': 'Soup', 'description': '', 'instructions': instructions(1),
+            'prep_time': 5, 'cook_time': 30, 'servings': 4, 'difficulty': 'easy',
+            'ingredients': [{'ingredient': ingredient.pk, 'quantity': '1', 'unit': 'g'} for ingredient in self.ingredients],
+        }
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', data, content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 201)
+        signature_writes = [
+            query['sql'] for query in queries.captured_queries
+            if 'recipes_recipesignature' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE'))
+        ]
+        self.assertEqual(len(signature_writes), 1)
+        self.assertEqual(RecipeSignature.objects.count(), 1)
+
+    def test_failed_batch_schedules_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic(), batched_signature_updates():
+                Recipe.objects.create(user=self.user, name='Soup', description='', instructions='Boil', prep_time=5, cook_time=30)
+                raise ValueError
+        self.assertEqual(callbacks, [])
+
+
+class ScanDuplicatesCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('cook', password='password123')
+        text = instructions(1)
+        for i in range(5):
+            # Re-imported copies, each with a light edit
+            Recipe.objects.create(user=user, name=f'Soup {i}', description='', instructions=edited(text) if i else text, prep_time=5, cook_time=30)
+        for seed in range(2, 6):
+            Recipe.objects.create(user=user, name=f'Other {seed}', description='', instructions=instructions(seed), prep_time=5, cook_time=30)
+
+    def scan(self):
+        path = os.path.join(tempfile.mkdtemp(), 'pairs.csv')
+        output = StringIO()
+        call_command('scan_duplicate_recipes', workers=1, output=path, stdout=output)
+        with open(path) as f:
+            return [tuple(row[:2]) for row in csv.reader(f)][1:], output.getvalue()
+
+    def test_reports_pairs(self):
+        pairs, output = self.scan()
+        self.assertEqual(len(pairs), 10)
+        self.assertIn('Found 10 likely duplicate pairs in 1 groups', output)
+
+    def test_large_buckets_are_compared_not_skipped(self):
+        expected, _ = self.scan()
+        with mock.patch('apps.recipes.management.commands.scan_duplicate_recipes.MAX_BUCKET_SIZE', 2), \
+                mock.patch('apps.recipes.management.commands.scan_duplicate_recipes.LARGE_BUCKET_CELLS', 64):
+            pairs, output = self.scan()
+        self.assertEqual(pairs, expected)
+        self.assertIn('buckets of more than 2 recipes pairwise', output)
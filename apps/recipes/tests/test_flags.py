@@ -0,0 +1,143 @@
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from apps.categories.models import Category
+from apps.core.test_runner import TestCase
+from apps.ingredients.models import Ingredient
+from apps.ingredients.tags import TAGS, to_flags
+from apps.recipes.models import Recipe, RecipeIngredient
+from apps.users.models import UserProfile
+
+
+def create_recipe(user, name, ingredients, category=None):
+    recipe = Recipe.objects.create(
+        user=user, category=category, name=name, description=name,
+        instructions='Cook everything together and season to taste.', prep_time=10, cook_time=20,
+    )
+    for ingredient in ingredients:
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1, unit='cup')
+    return recipe
+
+
+class FlagMaintenanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook')
+        cls.flour = Ingredient.objects.create(name='Flour', flags=to_flags(['gluten']))
+        cls.butter = Ingredient.objects.create(name='Butter', flags=to_flags(['milk', 'animal_product']))
+        cls.rice = Ingredient.objects.create(name='Rice')
+
+    def flags(self, recipe):
+        recipe.refresh_from_db(fields=['flags'])
+        return recipe.flags
+
+    def test_flags_are_union_of_ingredient_flags(self):
+        recipe = create_recipe(self.user, 'Shortbread', [self.flour, self.butter])
+        self.assertEqual(self.flags(recipe), to_flags(['gluten', 'milk', 'animal_product']))
+
+    def test_removing_an_ingredient_clears_its_flags(self):
+        recipe = create_recipe(self.user, 'Shortbread', [self.flour, self.butter])
+        RecipeIngredient.objects.get(recipe=recipe, ingredient=self.butter).delete()
+        self.assertEqual(self.flags(recipe), TAGS['gluten'])
+
+    def test_swapping_an_ingredient_recomputes_flags(self):
+        recipe = create_recipe(self.user, 'Pilaf', [self.butter])
+        recipe_ingredient = RecipeIngredient.objects.get(recipe=recipe)
+        recipe_ingredient.ingredient = self.rice
+        recipe_ingredient.save()
+        self.assertEqual(self.flags(recipe), 0)
+
+    def test_ingredient_tag_changes_propagate(self):
+        recipe = create_recipe(self.user, 'Shortbread', [self.flour, self.butter])
+        plain = create_recipe(self.user, 'Rice', [self.rice])
+        self.rice.flags = TAGS['sesame']
+        self.rice.save()
+        self.assertEqual(self.flags(plain), TAGS['sesame'])
+
+        # Milk is still set by the butter after the flour loses it
+        self.flour.flags = TAGS['milk']
+        self.flour.save()
+        self.assertEqual(self.flags(recipe), to_flags(['milk', 'animal_product']))
+        self.butter.flags = 0
+        self.butter.save()
+        self.assertEqual(self.flags(recipe), TAGS['milk'])
+
+    def test_flags_do_not_touch_updated_at(self):
+        recipe = create_recipe(self.user, 'Rice', [self.rice])
+        updated_at = Recipe.objects.get(pk=recipe.pk).updated_at
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.flour, quantity=1, unit='cup')
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).updated_at, updated_at)
+
+
+class SafeListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook')
+        cls.token = Token.objects.create(user=cls.user)
+        UserProfile.objects.create(user=cls.user, allergies='dairy')
+        cls.category = Category.objects.create(name='Dinner')
+        rice = Ingredient.objects.create(name='Rice')
+        cls.salt = salt = Ingredient.objects.create(name='Salt')
+        butter = Ingredient.objects.create(name='Butter', flags=TAGS['milk'])
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.plain = create_recipe(cls.user, 'Plain rice', [rice, salt], cls.category)
+            cls.buttered = create_recipe(cls.user, 'Buttered rice', [rice, salt, butter], cls.category)
+
+    def get(self, path, token=True):
+        headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'} if token else {}
+        return self.client.get(path, **headers)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        if isinstance(data, dict) and 'results' in data:
+            data = data['results']
+        elif isinstance(data, dict) and 'days' in data:
+            data = [recipe for day in data['days'] for recipe in day['recipes']]
+        return sorted(item['recipe']['name'] if 'recipe' in item else item['name'] for item in data)
+
+    def test_listings_leave_out_unsafe_recipes(self):
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/my_recipes/',
+            '/api/recipes/search_by_ingredient/?ingredient=rice',
+            '/api/recipes/meal_plan/?recipes=2&days=1',
+            f'/api/categories/{self.category.pk}/recipes/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertEqual(self.names(self.get(path)), ['Plain rice'])
+                separator = '&' if '?' in path else '?'
+                self.assertEqual(
+                    self.names(self.get(f'{path}{separator}safe_for_me=false')), ['Buttered rice', 'Plain rice']
+                )
+
+    def test_possible_duplicates_leave_out_unsafe_recipes(self):
+        path = f'/api/recipes/{self.plain.pk}/possible_duplicates/?threshold=0.1'
+        self.assertEqual(self.names(self.get(path)), [])
+        self.assertEqual(self.names(self.get(f'{path}&safe_for_me=false')), ['Buttered rice'])
+
+    def test_anonymous_category_listing_is_unfiltered(self):
+        path = f'/api/categories/{self.category.pk}/recipes/'
+        # The shared cached listing is filtered per request
+        self.assertEqual(self.names(self.get(path)), ['Plain rice'])
+        self.assertEqual(self.names(self.get(path, token=False)), ['Buttered rice', 'Plain rice'])
+
+    def test_ingredient_tag_changes_apply_to_cached_category_listing(self):
+        path = f'/api/categories/{self.category.pk}/recipes/'
+        self.assertEqual(self.names(self.get(path)), ['Plain rice'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.flags = TAGS['milk']
+            self.salt.save()
+        self.assertEqual(self.names(self.get(path)), [])
+        self.assertEqual(self.names(self.get(path, token=False)), ['Buttered rice', 'Plain rice'])
+
+    def test_profile_changes_apply_to_cached_listings(self):
+        self.assertEqual(self.names(self.get('/api/recipes/')), ['Plain rice'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                '/api/auth/profile/', {'allergies': ''}, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            )
+        self.assertEqual(response.data['profile']['excluded_tags'], [])
+        self.assertEqual(self.names(self.get('/api/recipes/')), ['Buttered rice', 'Plain rice'])
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from apps.core.test_runner import TestCase
+from apps.ingredients.models import Ingredient
+from apps.recipes.mealplan import load_library, plan_meals
+from apps.recipes.models import Recipe, RecipeIngredient
+
+
+class MealPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+        flour = Ingredient.objects.create(name='Flour')
+        for name, minutes in [('Bread', 60), ('Pancakes', 20), ('Crepes', 15)]:
+            recipe = Recipe.objects.create(
+                user=cls.user, name=name, description=name, instructions='Mix and cook.',
+                prep_time=minutes, cook_time=0,
+            )
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=flour, quantity=100, unit='g')
+
+    def get(self, query):
+        return self.client.get(f'/api/recipes/meal_plan/?{query}', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_plan_respects_daily_time(self):
+        response = self.get('recipes=2&days=2&max_daily_time=30')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['complete'])
+        names = {recipe['name'] for day in response.data['days'] for recipe in day['recipes']}
+        self.assertEqual(names, {'Pancakes', 'Crepes'})
+
+    def test_values_below_one_are_rejected(self):
+        for query in ['max_daily_time=0', 'max_daily_time=-30', 'recipes=0', 'recipes=-1', 'days=0', 'days=-7']:
+            with self.subTest(query=query):
+                self.assertEqual(self.get(query).status_code, 400)
+
+    def test_planner_rejects_values_below_one(self):
+        with self.assertRaises(ValueError):
+            plan_meals(Recipe.objects.all(), 2, 2, max_daily_time=0)
+
+
+class PlannerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+
+    def recipe(self, name, minutes, ingredients):
+        recipe = Recipe.objects.create(
+            user=self.user, name=name, description=name, instructions='Cook.', prep_time=minutes, cook_time=0,
+        )
+        for ingredient in ingredients:
+            ingredient, _ = Ingredient.objects.get_or_create(name=ingredient)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1, unit='g')
+        return recipe
+
+    def names(self, plan):
+        return [sorted(Recipe.objects.get(pk=pk).name for pk in day) for day in plan.days]
+
+    def test_plan_reuses_ingredients(self):
+        self.recipe('Salad', 10, ['Lettuce', 'Cucumber'])
+        self.recipe('Pasta', 20, ['Pasta', 'Tomato'])
+        self.recipe('Stew', 20, ['Beef', 'Carrot'])
+        self.recipe('Bruschetta', 10, ['Bread', 'Tomato'])
+
+        plan = plan_meals(Recipe.objects.all(), 2, 1)
+
+        self.assertTrue(plan.complete)
+        self.assertEqual(self.names(plan), [['Bruschetta', 'Pasta']])
+        self.assertEqual(
+            set(Ingredient.objects.filter(pk__in=plan.ingredient_ids).values_list('name', flat=True)),
+            {'Pasta', 'Bread', 'Tomato'},
+        )
+
+    def test_first_pick_leaves_time_for_the_rest_of_the_day(self):
+        # Bread ties with the others and comes first, but leaves no room for a second recipe
+        self.recipe('Bread', 50, ['Flour'])
+        self.recipe('Pancakes', 30, ['Flour'])
+        self.recipe('Crepes', 30, ['Flour'])
+
+        plan = plan_meals(Recipe.objects.all(), 2, 1, max_daily_time=60)
+
+        self.assertTrue(plan.complete)
+        self.assertEqual(self.names(plan), [['Crepes', 'Pancakes']])
+
+    def test_recipes_created_while_loading_are_ignored(self):
+        self.recipe('Pancakes', 20, ['Flour'])
+        filter_ingredients = RecipeIngredient.objects.filter
+
+        def create_recipe_first(*args, **kwargs):
+            self.recipe('Bread', 60, ['Flour'])
+            return filter_ingredients(*args, **kwargs)
+
+        with mock.patch.object(RecipeIngredient.objects, 'filter', side_effect=create_recipe_first):
+            ids, times, pair_recipes, pair_ingredients, ingredient_ids = load_library(Recipe.objects.all())
+
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(list(pair_recipes), [0])
+        self.assertEqual(len(pair_ingredients), 1)
@@ -0,0 +1,217 @@
+"""
+Query plan regression tests.
+
+Every endpoint below is requested against a generated dataset (analyzed, so
+SQLite plans as it would on a real database) while its SQL is captured. Each
+SELECT is run through EXPLAIN QUERY PLAN and the test fails when:
+
+- a query scans recipes_recipe or recipes_recipeingredient, or builds an
+  automatic index on them, instead of searching an index;
+- a listing that should be served in index order needs a temporary sort,
+  e.g. after adding an ordering field without a supporting index;
+- the access paths differ from the golden ones in query_plans.json, which
+  catches added queries (N+1) and indexes that stopped being used.
+
+Only the access paths are compared: for each query, how every table is read
+(searched or scanned, and through which index). The rest of the EXPLAIN
+output, such as its wording and the order of joins, varies between SQLite
+versions. After a deliberate change, review the new access paths and
+regenerate the golden file with::
+
+    UPDATE_QUERY_PLANS=1 python manage.py test apps.recipes.tests.test_query_plans
+"""
+import json
+import os
+import random
+import re
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from apps.categories.models import Category
+from apps.core.test_runner import TestCase, reset_process_state
+from apps.ingredients.models import Ingredient
+from apps.ingredients.tags import TAGS
+from apps.recipes.models import Recipe, RecipeIngredient
+from apps.recipes.views import RecipeViewSet
+from apps.users.models import UserProfile
+
+GOLDEN_PATH = Path(__file__).with_name('query_plans.json')
+UPDATE = os.environ.get('UPDATE_QUERY_PLANS') == '1'
+
+USERS = 3
+RECIPES_PER_USER = 1000
+INGREDIENTS = 300
+INGREDIENTS_PER_RECIPE = 6
+CATEGORIES = 8
+
+GUARDED_TABLES = ['recipes_recipe', 'recipes_recipeingredient']
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+# "SEARCH recipes_recipe USING INDEX name (user_id=?)"; older SQLite versions
+# write "SCAN TABLE recipes_recipe AS U0"
+ACCESS_RE = re.compile(
+    r'^(?P<op>SEARCH|SCAN) (?:TABLE )?(?P<table>\S+)(?: AS (?P<alias>\S+))?'
+    r'(?: USING (?:(?P<automatic>AUTOMATIC )?(?:PARTIAL )?(?:COVERING )?INDEX (?P<index>\S+)'
+    r'|(?P<primary_key>(?:INTEGER )?PRIMARY KEY)))?'
+)
+# Django aliases tables in subqueries: FROM "recipes_recipe" U0
+SQL_ALIAS_RE = re.compile(r'"(\w+)" (U\d+)\b')
+
+# name: (path, served in index order)
+CASES = {
+    'recipe-list': ('/api/recipes/', True),
+    'recipe-list-page-3': ('/api/recipes/?page=3', True),
+    'recipe-list-category': ('/api/recipes/?category={category}', False),
+    'recipe-list-difficulty': ('/api/recipes/?difficulty=easy', False),
+    'recipe-list-search': ('/api/recipes/?search=soup', False),
+    'recipe-list-unfiltered': ('/api/recipes/?safe_for_me=false', True),
+    'recipe-detail': ('/api/recipes/{recipe}/', False),
+    'my-recipes': ('/api/recipes/my_recipes/', True),
+    'search-by-ingredient': ('/api/recipes/search_by_ingredient/?ingredient=ingredient 1', False),
+    'possible-duplicates': ('/api/recipes/{recipe}/possible_duplicates/', False),
+    'meal-plan': ('/api/recipes/meal_plan/?recipes=7&days=7&max_daily_time=120', False),
+    'category-recipes': ('/api/categories/{category}/recipes/', False),
+    'ingredient-list': ('/api/ingredients/', False),
+}
+for field in RecipeViewSet.ordering_fields:
+    for prefix in ('', '-'):
+        CASES[f'recipe-list-ordering-{prefix}{field}'] = (f'/api/recipes/?ordering={prefix}{field}', True)
+
+
+def build_dataset():
+    rng = random.Random(0)
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(CATEGORIES)])
+    tag_bits = list(TAGS.values())
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(name=f'ingredient {i}', flags=rng.choice(tag_bits) if rng.random() < 0.2 else 0)
+        for i in range(INGREDIENTS)
+    ])
+    words = ['soup', 'stew', 'salad', 'cake', 'bread', 'curry', 'pie', 'roast']
+    owner = None
+    for u in range(USERS):
+        user = User.objects.create_user(f'user{u}', password='password123')
+        UserProfile.objects.create(user=user, allergies='nuts, dairy')
+        owner = owner or user
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=user, category=rng.choice(categories + [None]),
+                name=f'{rng.choice(words)} {i}', description=f'A {rng.choice(words)}',
+                instructions=' '.join(rng.choice(words) for _ in range(40)),
+                prep_time=rng.randint(5, 60), cook_time=rng.randint(5, 120),
+                difficulty=rng.choice(['easy', 'medium', 'hard']),
+                view_count=rng.randint(0, 1000), trending_score=rng.random() * 100,
+            )
+            for i in range(RECIPES_PER_USER)
+        ])
+        rows = []
+        for recipe in recipes:
+            for ingredient in rng.sample(ingredients, INGREDIENTS_PER_RECIPE):
+                rows.append(RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=1, unit='g'))
+                recipe.flags |= ingredient.flags
+        RecipeIngredient.objects.bulk_create(rows)
+        Recipe.objects.bulk_update(recipes, ['flags'])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return owner, categories[0]
+
+
+class QueryRecorder:
+    """execute_wrapper collecting the SELECT statements run"""
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        rows = cursor.fetchall()
+    # Indent children under their parent node
+    depth = {0: -1}
+    plan = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        plan.append('  ' * depth[node_id] + detail)
+    return plan
+
+
+def access_paths(sql, plan):
+    """
+    How each table is read by a query, e.g. "SEARCH recipes_recipe USING
+    recipes_rec_user_id_384a10_idx" or "SCAN categories_category", sorted.
+    """
+    aliases = dict((alias, table) for table, alias in SQL_ALIAS_RE.findall(sql))
+    paths = set()
+    for line in plan:
+        match = ACCESS_RE.match(line.strip())
+        if not match:
+            continue
+        name = match['alias'] or match['table']
+        path = f"{match['op']} {aliases.get(name, name)}"
+        if match['automatic']:
+            path += ' USING AUTOMATIC INDEX'
+        elif match['index']:
+            path += f" USING {match['index']}"
+        elif match['primary_key']:
+            path += ' USING PRIMARY KEY'
+        paths.add(path)
+    return sorted(paths)
+
+
+def is_unindexed(path):
+    op, table = path.split()[:2]
+    return table in GUARDED_TABLES and (op == 'SCAN' or path.endswith('AUTOMATIC INDEX'))
+
+
+@override_settings(THROTTLING={'RATES': {'user': (10 ** 6, 10 ** 6), 'anon': (10 ** 6, 10 ** 6), 'endpoint': (10 ** 6, 10 ** 6)}})
+class QueryPlanTests(TestCase):
+    maxDiff = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.category = build_dataset()
+        cls.recipe = Recipe.objects.filter(user=cls.user).order_by('pk').first()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def capture(self, path):
+        # Cached responses would hide the queries
+        reset_process_state()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(path, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200, f'{path}: {response.content[:200]}')
+        return [{'sql': sql, 'plan': explain(sql, params)} for sql, params in recorder.queries]
+
+    def test_query_plans(self):
+        golden = json.loads(GOLDEN_PATH.read_text()) if GOLDEN_PATH.exists() else {}
+        plans = {}
+        for name, (path, index_ordered) in CASES.items():
+            path = path.format(recipe=self.recipe.pk, category=self.category.pk)
+            queries = self.capture(path)
+            paths = [access_paths(query['sql'], query['plan']) for query in queries]
+            plans[name] = {'path': path, 'queries': paths}
+            with self.subTest(endpoint=name):
+                for query, query_paths in zip(queries, paths):
+                    unindexed = [access for access in query_paths if is_unindexed(access)]
+                    plan = '\n'.join(query['plan'])
+                    self.assertFalse(unindexed, f"{path} reads a whole table: {unindexed}\n{query['sql']}\n{plan}")
+                    if index_ordered:
+                        self.assertNotIn(
+                            TEMP_SORT, [line.strip() for line in query['plan']],
+                            f"{path} sorts in a temporary b-tree instead of reading an index in order\n{query['sql']}\n{plan}"
+                        )
+                if not UPDATE:
+                    self.assertIn(name, golden, f'No golden plan for {name}, run with UPDATE_QUERY_PLANS=1')
+                    self.assertEqual(
+                        paths, golden[name]['queries'],
+                        f'Access paths for {path} changed, review them and run with UPDATE_QUERY_PLANS=1',
+                    )
+        if UPDATE:
+            GOLDEN_PATH.write_text(json.dumps(plans, indent=2, sort_keys=True) + '\n')
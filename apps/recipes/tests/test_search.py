@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from apps.core.test_runner import TestCase
+from apps.recipes.models import Recipe
+
+
+class InstructionSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.mousse = Recipe.objects.create(
+            user=cls.user, name='Mousse', description='Chocolate dessert',
+            instructions='Melt the chocolate, then fold in the whipped cream.', prep_time=20, cook_time=0,
+        )
+        Recipe.objects.create(
+            user=cls.user, name='Toast', description='Breakfast',
+            instructions='Toast the bread.', prep_time=1, cook_time=3,
+        )
+        other = User.objects.create_user('other', password='password123')
+        Recipe.objects.create(
+            user=other, name='Trifle', description='Dessert',
+            instructions='Layer sponge, custard and whipped cream.', prep_time=30, cook_time=0,
+        )
+
+    def search(self, term):
+        response = self.client.get('/api/recipes/', {'search': term}, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_search_matches_instructions(self):
+        self.assertEqual(self.search('WHIPPED'), ['Mousse'])
+
+    def test_search_still_matches_name_and_description(self):
+        self.assertEqual(self.search('toast'), ['Toast'])
+        self.assertEqual(self.search('dessert'), ['Mousse'])
+
+    def test_lookups_on_compressed_instructions(self):
+        self.assertEqual(list(Recipe.objects.filter(instructions__contains='whipped cream', user=self.user)), [self.mousse])
+        self.assertEqual(Recipe.objects.filter(instructions__icontains='WHIPPED').count(), 2)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from apps.core.pubsub import broker
+from apps.core.test_runner import TestCase
+from apps.recipes.signals import user_channel
+from apps.recipes.streams import EVENTS_PATH, TICKET_MAX_AGE, issue_ticket, open_streams, recipe_events
+
+
+class Connection:
+    """Drives recipe_events the way an ASGI server would"""
+
+    def __init__(self, query='', headers=()):
+        self.scope = {
+            'type': 'http', 'method': 'GET', 'path': EVENTS_PATH,
+            'query_string': query.encode(), 'headers': [(k.encode(), v.encode()) for k, v in headers],
+        }
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.started = asyncio.Event()
+        self.task = asyncio.ensure_future(recipe_events(self.scope, self.incoming.get, self.send))
+
+    async def send(self, message):
+        self.sent.append(message)
+        if message['type'] == 'http.response.start':
+            self.started.set()
+
+    async def status(self):
+        await asyncio.wait_for(self.started.wait(), 5)
+        return self.sent[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(message.get('body', b'') for message in self.sent[1:])
+
+    async def close(self):
+        await self.incoming.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 5)
+
+
+class StreamTicketTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cook', password='password123')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def test_ticket_endpoint_requires_authentication(self):
+        self.assertEqual(self.client.post('/api/events/recipes/ticket/').status_code, 401)
+        response = self.client.post('/api/events/recipes/ticket/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], TICKET_MAX_AGE)
+        self.assertEqual(signing.loads(response.data['ticket'], salt='apps.recipes.streams.ticket'), self.user.pk)
+
+    async def test_ticket_opens_stream(self):
+        connection = Connection(f'ticket={issue_ticket(self.user)}')
+        self.assertEqual(await connection.status(), 200)
+        await connection.close()
+        self.assertEqual(open_streams, {})
+
+    async def test_header_token_opens_stream(self):
+        connection = Connection(headers=[('authorization', f'Token {self.token.key}')])
+        self.assertEqual(await connection.status(), 200)
+        await connection.close()
+
+    async def test_api_token_in_query_is_rejected(self):
+        connection = Connection(f'token={self.token.key}')
+        self.assertEqual(await connection.status(), 401)
+
+    async def test_tampered_ticket_is_rejected(self):
+        connection = Connection(f'ticket={issue_ticket(self.user)}x')
+        self.assertEqual(await connection.status(), 401)
+
+    async def test_expired_ticket_is_rejected(self):
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - TICKET_MAX_AGE - 5):
+            ticket = issue_ticket(self.user)
+        connection = Connection(f'ticket={ticket}')
+        self.assertEqual(await connection.status(), 401)
+
+    @override_settings(LOAD_SHEDDING={'MAX_STREAMS_PER_CLIENT': 1, 'RETRY_AFTER': 3})
+    async def test_streams_per_client_are_capped(self):
+        first = Connection(f'ticket={issue_ticket(self.user)}')
+        self.assertEqual(await first.status(), 200)
+        second = Connection(f'ticket={issue_ticket(self.user)}')
+        self.assertEqual(await second.status(), 429)
+        self.assertIn((b'retry-after', b'3'), second.sent[0]['headers'])
+        await first.close()
+        third = Connection(f'ticket={issue_ticket(self.user)}')
+        self.assertEqual(await third.status(), 200)
+        await third.close()
+
+    @override_settings(LOAD_SHEDDING={'MAX_STREAMS': 1})
+    async def test_streams_per_process_are_capped(self):
+        other = await User.objects.acreate(username='other')
+        first = Connection(f'ticket={issue_ticket(other)}')
+        self.assertEqual(await first.status(), 200)
+        second = Connection(f'ticket={issue_ticket(self.user)}')
+        self.assertEqual(await second.status(), 503)
+        await first.close()
+
+    async def test_missed_events_are_replayed(self):
+        first = broker.publish(user_channel(self.user.pk), 'recipe.updated', {'id': 1})
+        broker.publish(user_channel(self.user.pk), 'recipe.deleted', {'id': 1})
+        connection = Connection(f'ticket={issue_ticket(self.user)}', [('last-event-id', first.id)])
+        self.assertEqual(await connection.status(), 200)
+        await asyncio.sleep(0.05)
+        await connection.close()
+        self.assertIn(b'event: recipe.deleted', connection.body)
+        self.assertNotIn(b'event: recipe.updated', connection.body)
+
+    async def test_unknown_event_id_resets_client(self):
+        connection = Connection(f'ticket={issue_ticket(self.user)}', [('last-event-id', 'stale-1')])
+        self.assertEqual(await connection.status(), 200)
+        await asyncio.sleep(0.05)
+        await connection.close()
+        self.assertIn(b'event: reset', connection.body)
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RecipeViewSet
+from .views import RecipeViewSet, events_ticket
 
 router = DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipe')
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('api/events/recipes/ticket/', events_ticket, name='recipe-events-ticket'),
 ]
\ No newline at end of file
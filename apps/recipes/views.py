@@ -1,10 +1,17 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.authentication import TokenAuthentication, SessionAuthentication
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from apps.core.counters import view_counter
+from apps.core.response_cache import cached_response
+from .caching import recipe_detail_key, recipe_list_key
+from .dedup import DEFAULT_THRESHOLD, find_duplicates
+from .filters import SafeForMeFilter
+from .mealplan import MAX_DAYS, MAX_RECIPES, plan_meals
 from .models import Recipe, RecipeIngredient
+from .streams import TICKET_MAX_AGE, issue_ticket
 from .serializers import (
     RecipeSerializer, RecipeCreateSerializer, RecipeListSerializer,
     RecipeIngredientSerializer
@@ -21,12 +28,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name', 'description', 'instructions']
     filterset_fields = ['category', 'difficulty']  # Removed 'user' since we filter by user automatically
-    ordering_fields = ['created_at', 'prep_time', 'cook_time', 'name']
+    ordering_fields = ['created_at', 'prep_time', 'cook_time', 'name', 'view_count', 'trending_score']
     ordering = ['-created_at']
+    # Token cost per request, see apps/core/throttling.py
+    throttle_costs = {
+        'search_by_ingredient': 5,
+        'possible_duplicates': 5,
+        'meal_plan': 10,
+        'list': 2,
+        'my_recipes': 2,
+        'default': 1,
+    }
+    
+    listing_actions = ['list', 'my_recipes', 'search_by_ingredient']
     
     def get_queryset(self):
         # Only return recipes owned by the current user
-        return Recipe.objects.filter(user=self.request.user).select_related('user', 'category').prefetch_related('recipe_ingredients__ingredient')
+        queryset = Recipe.objects.filter(user=self.request.user)
+        if self.action in self.listing_actions:
+            # Listings leave out recipes unsafe for the user by default
+            queryset = SafeForMeFilter().filter_queryset(self.request, queryset, self)
+            return queryset.for_listing().prefetch_related('recipe_ingredients')
+        return queryset.select_related('user', 'category').prefetch_related('recipe_ingredients__ingredient')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -35,11 +58,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeListSerializer
         return RecipeSerializer
     
+    @cached_response(recipe_list_key)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = self.retrieve_cached(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Counted here so that cache hits count too
+            view_counter.incr(Recipe, int(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        return response
+    
+    @cached_response(recipe_detail_key)
+    def retrieve_cached(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         # Automatically set the user when creating a recipe
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_response(recipe_list_key)
     def my_recipes(self, request):
         """Get current user's recipes (same as list, but explicit endpoint)"""
         recipes = self.get_queryset()
@@ -76,15 +115,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Ingredient not found in recipe'}, status=status.HTTP_404_NOT_FOUND)
     
     @action(detail=False, methods=['get'])
+    @cached_response(recipe_list_key)
     def search_by_ingredient(self, request):
         """Search recipes by ingredient name (within user's own recipes)"""
         ingredient_name = request.query_params.get('ingredient', '')
         if not ingredient_name:
             return Response({'error': 'ingredient parameter required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        recipes = self.get_queryset().filter(
-            recipe_ingredients__ingredient__name__icontains=ingredient_name
-        ).distinct()
+        # EXISTS rather than a join, which would need DISTINCT and sorting
+        matches = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient__name__icontains=ingredient_name
+        )
+        recipes = self.get_queryset().filter(Exists(matches))
         
         page = self.paginate_queryset(recipes)
         if page is not None:
@@ -92,4 +134,98 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(serializer.data)
         
         serializer = RecipeListSerializer(recipes, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def possible_duplicates(self, request, pk=None):
+        """List the user's recipes that are likely near-duplicates of this one"""
+        recipe = self.get_object()
+        try:
+            threshold = float(request.query_params.get('threshold', DEFAULT_THRESHOLD))
+        except ValueError:
+            return Response({'error': 'threshold must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        matches = find_duplicates(recipe, threshold)
+        recipes = Recipe.objects.filter(pk__in=[recipe_id for recipe_id, _ in matches])
+        recipes = SafeForMeFilter().filter_queryset(request, recipes, self).for_listing().prefetch_related('recipe_ingredients')
+        recipes_by_id = {candidate.pk: candidate for candidate in recipes}
+        return Response([
+            {'similarity': round(score, 3), 'recipe': RecipeListSerializer(recipes_by_id[recipe_id]).data}
+            for recipe_id, score in matches if recipe_id in recipes_by_id
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def meal_plan(self, request):
+        """
+        Plan ``recipes`` meals over ``days`` days from the user's recipes,
+        keeping each day within ``max_daily_time`` minutes and sharing as
+        many ingredients as possible. ``difficulty`` takes a comma separated
+        list of allowed difficulties. Like the listings, the plan leaves out
+        recipes unsafe for the user unless ``safe_for_me=false``.
+        """
+        try:
+            count = int(request.query_params.get('recipes', 7))
+            days = int(request.query_params.get('days', 7))
+            max_daily_time = request.query_params.get('max_daily_time')
+            max_daily_time = int(max_daily_time) if max_daily_time else None
+        except ValueError:
+            return Response({'error': 'recipes, days and max_daily_time must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= count <= MAX_RECIPES or not 1 <= days <= MAX_DAYS:
+            return Response(
+                {'error': f'recipes must be between 1 and {MAX_RECIPES} and days between 1 and {MAX_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if max_daily_time is not None and max_daily_time < 1:
+            return Response({'error': 'max_daily_time must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        recipes = Recipe.objects.filter(user=request.user)
+        difficulty = request.query_params.get('difficulty')
+        if difficulty:
+            difficulties = difficulty.split(',')
+            valid = {choice for choice, _ in Recipe.DIFFICULTY_CHOICES}
+            if not set(difficulties) <= valid:
+                return Response({'error': f'difficulty must be one of {", ".join(sorted(valid))}'}, status=status.HTTP_400_BAD_REQUEST)
+            recipes = recipes.filter(difficulty__in=difficulties)
+        recipes = SafeForMeFilter().filter_queryset(request, recipes, self)
+        
+        plan = plan_meals(recipes, count, days, max_daily_time)
+        
+        chosen = Recipe.objects.filter(pk__in=plan.recipe_ids).for_listing().prefetch_related('recipe_ingredients')
+        chosen_by_id = {recipe.pk: recipe for recipe in chosen}
+        shopping_list = (
+            RecipeIngredient.objects.filter(recipe_id__in=plan.recipe_ids)
+            .values('ingredient', 'ingredient__name', 'unit')
+            .annotate(quantity=Sum('quantity'), recipes=Count('recipe'))
+            .order_by('ingredient__name', 'unit')
+        )
+        # Skips recipes deleted since the plan was made
+        days = [[chosen_by_id[pk] for pk in day if pk in chosen_by_id] for day in plan.days]
+        return Response({
+            'complete': plan.complete,
+            'days': [
+                {
+                    'day': number,
+                    'total_time': sum(recipe.total_time for recipe in day),
+                    'recipes': RecipeListSerializer(day, many=True).data,
+                }
+                for number, day in enumerate(days, 1)
+            ],
+            'shopping_list': [
+                {
+                    'ingredient': item['ingredient'],
+                    'ingredient_name': item['ingredient__name'],
+                    'quantity': str(item['quantity']),
+                    'unit': item['unit'],
+                    'recipes': item['recipes'],
+                }
+                for item in shopping_list
+            ],
+        })
+
+
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def events_ticket(request):
+    """Short-lived ticket for opening the change feed with EventSource"""
+    return Response({'ticket': issue_ticket(request.user), 'expires_in': TICKET_MAX_AGE})
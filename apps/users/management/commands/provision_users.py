@@ -0,0 +1,75 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.provisioning import DEFAULT_BATCH_SIZE, provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV or JSON file. CSV files need a header "
+        "row with username and password columns, and optionally email, "
+        "first_name and last_name. JSON files contain a list of objects with "
+        "the same keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file with one user per row')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of users written per bulk insert (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of password hashing processes (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--errors', default=None,
+            help='Where to write rejected rows (default: <path>.errors.csv)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        rows = self.read_rows(path)
+        if not rows:
+            raise CommandError(f"No users found in {path}")
+
+        started = time.monotonic()
+
+        def progress(created, total):
+            elapsed = time.monotonic() - started
+            rate = created / elapsed if elapsed else 0
+            self.stdout.write(f"Provisioned {created}/{total} users ({rate:.0f}/s)")
+
+        users, errors = provision_users(
+            rows,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            progress=progress,
+        )
+
+        if errors:
+            errors_path = options['errors'] or f"{path}.errors.csv"
+            with open(errors_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['row', 'username', 'error'])
+                writer.writerows(errors)
+            self.stderr.write(f"{len(errors)} rows rejected, see {errors_path}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users in {time.monotonic() - started:.1f}s"
+        ))
+
+    def read_rows(self, path):
+        try:
+            with open(path, newline='') as f:
+                if path.endswith('.json'):
+                    rows = json.load(f)
+                    if not isinstance(rows, list):
+                        raise CommandError("JSON input must be a list of users")
+                    return rows
+                return list(csv.DictReader(f))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+from apps.ingredients.tags import parse_exclusions
+
+BATCH_SIZE = 500
+
+
+def parse_profiles(apps, schema_editor):
+    UserProfile = apps.get_model("users", "UserProfile")
+    db_alias = schema_editor.connection.alias
+    profiles = (
+        UserProfile.objects.using(db_alias)
+        .exclude(allergies="", dietary_preferences="")
+        .only("id", "allergies", "dietary_preferences")
+    )
+    batch = []
+    for profile in profiles.iterator(chunk_size=BATCH_SIZE):
+        profile.excluded_flags = parse_exclusions(
+            profile.allergies, profile.dietary_preferences
+        )
+        batch.append(profile)
+        if len(batch) >= BATCH_SIZE:
+            UserProfile.objects.using(db_alias).bulk_update(batch, ["excluded_flags"])
+            batch = []
+    if batch:
+        UserProfile.objects.using(db_alias).bulk_update(batch, ["excluded_flags"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="excluded_flags",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(parse_profiles, migrations.RunPython.noop),
+    ]
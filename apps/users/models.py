@@ -1,13 +1,23 @@
 from django.db import models
 from django.contrib.auth.models import User
+from apps.ingredients.tags import parse_exclusions
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(blank=True, max_length=500)
     dietary_preferences = models.CharField(max_length=200, blank=True)
     allergies = models.CharField(max_length=200, blank=True)
+    # Tag flags excluded by allergies and dietary_preferences
+    excluded_flags = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        self.excluded_flags = parse_exclusions(self.allergies, self.dietary_preferences)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'allergies', 'dietary_preferences'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'excluded_flags'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.user.username}'s profile"
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Bulk user provisioning.
+
+Password hashing (PBKDF2) is CPU-bound and dominates the cost of creating
+users one at a time, so passwords are hashed across a process pool and the
+User, UserProfile and Token rows are then written with bulk_create in batches.
+
+The management command starts a pool for each import. Web requests share one
+pool per process instead (see ``shared_executor``), started with "spawn"
+since forking a threaded server process copies locks held by other threads.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from .models import UserProfile
+from .serializers import BulkUserSerializer
+
+DEFAULT_BATCH_SIZE = 1000
+# Hashing processes kept by each web worker process
+SHARED_WORKERS = min(os.cpu_count() or 1, 4)
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    # Workers started with the "spawn" method (the default on macOS) do not
+    # inherit the configured app registry, so set Django up again.
+    django.setup()
+
+
+def shared_executor():
+    """Long-lived hashing pool of this process, None on a single CPU"""
+    global _shared_executor
+    if SHARED_WORKERS < 2:
+        return None
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ProcessPoolExecutor(
+                max_workers=SHARED_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _shared_executor
+
+
+def _discard_shared_executor(executor):
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is executor:
+            _shared_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def validate_rows(rows):
+    """
+    Validate raw user rows.
+
+    Returns a list of (row_number, validated_data) tuples and a list of
+    (row_number, username, error) tuples. Usernames are checked against each
+    other and against the database with one query per batch rather than one
+    query per row.
+    """
+    valid, errors = [], []
+    seen = set()
+    for row_number, row in enumerate(rows, start=1):
+        serializer = BulkUserSerializer(data=row)
+        username = row.get('username', '') if isinstance(row, dict) else ''
+        if not serializer.is_valid():
+            errors.append((row_number, username, _format_errors(serializer.errors)))
+            continue
+        username = serializer.validated_data['username']
+        if username in seen:
+            errors.append((row_number, username, 'Duplicate username in input'))
+            continue
+        seen.add(username)
+        valid.append((row_number, serializer.validated_data))
+
+    existing = set()
+    usernames = [data['username'] for _, data in valid]
+    for batch in _chunks(usernames, DEFAULT_BATCH_SIZE):
+        existing.update(User.objects.filter(username__in=batch).values_list('username', flat=True))
+
+    if existing:
+        for row_number, data in valid:
+            if data['username'] in existing:
+                errors.append((row_number, data['username'], 'A user with that username already exists'))
+        valid = [(row_number, data) for row_number, data in valid if data['username'] not in existing]
+
+    errors.sort()
+    return valid, errors
+
+
+def _format_errors(errors):
+    messages = []
+    for field, field_errors in errors.items():
+        for error in field_errors:
+            messages.append(f"{field}: {error}")
+    return '; '.join(messages)
+
+
+def provision_users(rows, batch_size=DEFAULT_BATCH_SIZE, workers=None, progress=None, executor=None):
+    """
+    Create users, profiles and auth tokens in bulk.
+
+    ``rows`` is a list of dicts with ``username``, ``password`` and optionally
+    ``email``, ``first_name`` and ``last_name``. Passwords are hashed on
+    ``executor`` if given, which is left running, otherwise on a pool of
+    ``workers`` processes started for the call (default one per CPU).
+    ``progress`` is called with (created, total) after each batch is written.
+
+    Returns (created_users, errors) where errors is a list of
+    (row_number, username, error) tuples.
+    """
+    valid, errors = validate_rows(rows)
+    total = len(valid)
+    workers = workers or os.cpu_count() or 1
+    created_users = []
+
+    if not valid:
+        return created_users, errors
+
+    batches = list(_chunks(valid, batch_size))
+    password_batches = [[data['password'] for _, data in batch] for batch in batches]
+
+    owned = executor is None and workers > 1
+    if owned:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    if executor:
+        hashed_batches = executor.map(_hash_passwords, password_batches)
+    else:
+        hashed_batches = map(_hash_passwords, password_batches)
+
+    try:
+        # Batches are hashed in parallel while earlier ones are being written
+        for batch, hashed in zip(batches, hashed_batches):
+            try:
+                created_users.extend(_write_batch(batch, hashed))
+            except Exception as exc:
+                errors.extend((row_number, data['username'], str(exc)) for row_number, data in batch)
+            if progress:
+                progress(len(created_users), total)
+    except BrokenProcessPool:
+        if not owned:
+            # A worker died, start a fresh pool for the next request
+            _discard_shared_executor(executor)
+        raise
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+    errors.sort()
+    return created_users, errors
+
+
+def _write_batch(batch, hashed_passwords):
+    users = [
+        User(
+            username=data['username'],
+            email=data.get('email', ''),
+            first_name=data.get('first_name', ''),
+            last_name=data.get('last_name', ''),
+            password=password,
+        )
+        for (_, data), password in zip(batch, hashed_passwords)
+    ]
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backend cannot return primary keys from bulk inserts
+            users = list(User.objects.filter(username__in=[user.username for user in users]))
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+
+    return users
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from apps.ingredients.serializers import TagsField
 from .models import UserProfile
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -23,6 +25,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         UserProfile.objects.create(user=user)
         return user
 
+class BulkUserSerializer(serializers.Serializer):
+    """Validates one row of a bulk provisioning request"""
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    password = serializers.CharField(write_only=True, min_length=8)
+
 class UserLoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
@@ -44,10 +54,12 @@ class UserLoginSerializer(serializers.Serializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    # What allergies and dietary_preferences were understood as
+    excluded_tags = TagsField(source='excluded_flags', read_only=True)
     
     class Meta:
         model = UserProfile
-        fields = ['user', 'bio', 'dietary_preferences', 'allergies', 'created_at', 'updated_at']
+        fields = ['user', 'bio', 'dietary_preferences', 'allergies', 'excluded_tags', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
 class UserSerializer(serializers.ModelSerializer):
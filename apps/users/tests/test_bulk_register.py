@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from apps.core.test_runner import TestCase
+from apps.users.views import MAX_BULK_REGISTER_USERS
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkRegisterTests(TestCase):
+    url = '/api/auth/bulk-register/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='password123')
+        cls.token = Token.objects.create(user=cls.admin)
+
+    def post(self, data):
+        return self.client.post(self.url, data, content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_list_body_is_rejected(self):
+        response = self.post([{'username': 'alice', 'password': 'password123'}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_too_many_users_are_rejected(self):
+        users = [{'username': f'user{i}', 'password': 'password123'} for i in range(MAX_BULK_REGISTER_USERS + 1)]
+        response = self.post({'users': users})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username='user0').exists())
+
+    @mock.patch('apps.users.views.shared_executor', return_value=None)
+    def test_creates_users_with_profiles_and_tokens(self, shared_executor):
+        response = self.post({'users': [
+            {'username': 'alice', 'password': 'password123'},
+            {'username': 'admin', 'password': 'password123'},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+        alice = User.objects.get(username='alice')
+        self.assertTrue(alice.check_password('password123'))
+        self.assertTrue(hasattr(alice, 'profile'))
+        self.assertTrue(Token.objects.filter(user=alice).exists())
@@ -8,6 +8,11 @@ from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, 
     UserSerializer, UserProfileSerializer
 )
+from .provisioning import provision_users, shared_executor
+
+# Hashing takes a few hundred milliseconds per password and the request waits
+# for it, larger imports go through the provision_users command
+MAX_BULK_REGISTER_USERS = 100
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -24,6 +29,31 @@ def register(request):
         }, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def bulk_register(request):
+    """Admin-only bulk user provisioning endpoint"""
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Expected an object with a users list'}, status=status.HTTP_400_BAD_REQUEST)
+    rows = request.data.get('users')
+    if not isinstance(rows, list) or not rows:
+        return Response({'error': 'users must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > MAX_BULK_REGISTER_USERS:
+        return Response(
+            {'error': f'At most {MAX_BULK_REGISTER_USERS} users per request, use the provision_users command for larger imports'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    users, errors = provision_users(rows, executor=shared_executor())
+    return Response({
+        'created': len(users),
+        'failed': len(errors),
+        'errors': [
+            {'row': row_number, 'username': username, 'error': error}
+            for row_number, username, error in errors
+        ],
+    }, status=status.HTTP_201_CREATED if users else status.HTTP_400_BAD_REQUEST)
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def login(request):
@@ -2,6 +2,9 @@
 ASGI config for recipe_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The recipe change feed is served directly by an ASGI application so that
+idle streaming connections do not tie up Django's request handling; every
+other request goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +16,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_project.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up since it uses models
+from apps.recipes.streams import EVENTS_PATH, recipe_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        await recipe_events(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
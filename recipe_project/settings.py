@@ -1,5 +1,6 @@
 # recipe_project/settings.py
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +28,7 @@ THIRD_PARTY_APPS = [
 ]
 
 LOCAL_APPS = [
+    'apps.core',
     'apps.users',
     'apps.recipes',
     'apps.categories',
@@ -45,6 +47,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'corsheaders',
     'django_filters',  
+    'apps.core',
     'apps.users',
     'apps.recipes',
     'apps.categories',
@@ -53,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.ConcurrencyLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,13 +86,30 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'recipe_project.wsgi.application'
 
+# SQLite tuned for concurrent requests (see apps/core/sqlite/base.py). Reads
+# go to a read-only connection to the same file, see apps/core/routers.py.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'apps.core.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'replica': {
+        'ENGINE': 'apps.core.sqlite',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'read_only': True},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['apps.core.routers.ReadReplicaRouter']
+
+# Keeps background work from reaching the real database (see apps/core/test_runner.py)
+TEST_RUNNER = 'apps.core.test_runner.TestRunner'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -128,6 +149,79 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.CostBasedThrottle',
+    ],
+}
+
+# Per-client token buckets, charged by each view's throttle_costs
+# (see apps/core/throttling.py)
+THROTTLING = {
+    'BACKEND': 'local',  # 'cache' shares buckets between processes
+    'RATES': {
+        'user': (120, 2),
+        'anon': (60, 1),
+        'endpoint': (60, 1),
+    },
+    'PAGE_COST_STEP': 10,
+}
+
+# Requests a worker process accepts at once (see apps/core/middleware.py)
+LOAD_SHEDDING = {
+    'MAX_IN_FLIGHT': 64,
+    'MAX_IN_FLIGHT_PER_CLIENT': 8,
+    # Open change feed streams per process, see apps/recipes/streams.py
+    'MAX_STREAMS': 1000,
+    'MAX_STREAMS_PER_CLIENT': 4,
+    'RETRY_AFTER': 1,
+    'EXEMPT_PATHS': ['/admin/'],
+}
+
+# Batched sub-requests at /api/batch/ (see apps/core/batch.py)
+BATCH_REQUESTS = {
+    'MAX_REQUESTS': 20,
+    'MAX_WORKERS': 4,
+}
+
+# Shared by all worker processes: it holds the version counters that
+# invalidate cached responses, listing cache entries and locks, and throttle
+# buckets. The default local memory cache is per process, so a change made
+# in one worker would not invalidate the cached responses of the others.
+# Files work for workers on one host, which the SQLite database already
+# requires. FileBasedCache.add() is not atomic though, so two workers can
+# both take a listing refresh lock (see apps/core/cache.py), and every set
+# lists the cache directory to decide whether to cull. Use RedisCache,
+# which has an atomic add, under heavy load or on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'recipe_project_cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Single-flight cache for hot public listings (see apps/core/cache.py)
+LISTING_CACHE = {
+    'TTL': 60,
+    'STALE_TTL': 300,
+    'BETA': 1.0,
+}
+
+# Per-process cache of rendered recipe responses (see apps/core/response_cache.py)
+RESPONSE_CACHE = {
+    'MAX_BYTES': 32 * 1024 * 1024,
+    'TTL': 300,
+}
+
+# Write-behind view counters (see apps/core/counters.py)
+VIEW_COUNTERS = {
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 1000,
+    'TRENDING_HALF_LIFE': 7 * 24 * 3600,
+    'BACKGROUND_FLUSH': True,
+    # Directory keeping counts that could not be written on shutdown, shared
+    # by all worker processes (e.g. '/var/lib/recipes/counters'); None drops them
+    'SPILL_DIR': None,
 }
 
 # CORS settings
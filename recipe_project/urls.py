@@ -11,6 +11,7 @@ urlpatterns = [
     path('', include('apps.ingredients.urls')),
     path('', include('apps.recipes.urls')),
     path('', include('apps.users.urls')),
+    path('', include('apps.core.urls')),
     
     # DRF Browsable API
     path('api-auth/', include('rest_framework.urls')),